@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Protocol
+
+from .imaging import GradingImageOptions, ImagePayload
+from .metrics import CallSpan
+from .openai_client import GradeResult
+
+
+BACKENDS = ("openai", "fake")
+
+
+class ImageBackend(Protocol):
+    async def generate_images(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        size: str,
+        quality: str,
+        background: str,
+        n: int,
+        variant: int = 0,
+        span: CallSpan | None = None,
+    ) -> list[ImagePayload]: ...
+
+    async def edit_images(
+        self,
+        *,
+        model: str,
+        image_bytes: bytes,
+        prompt: str,
+        size: str,
+        quality: str,
+        background: str,
+        n: int,
+        mask: bytes | None = None,
+        variant: int = 0,
+        span: CallSpan | None = None,
+    ) -> list[ImagePayload]: ...
+
+
+class GradeBackend(Protocol):
+    image_options: GradingImageOptions
+
+    async def grade_image(
+        self,
+        *,
+        model: str,
+        rubric: list[str],
+        prompt: str,
+        slide_title: str,
+        image_bytes: bytes,
+        image_b64: str | None = None,
+        span: CallSpan | None = None,
+        precheck: bool = False,
+    ) -> GradeResult: ...
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from openai import AsyncOpenAI
+
+from .fake import FakeBatchClient, FakeOptions
+from .imaging import encode_for_grading
+from .openai_client import (
+    GradeResult,
+    RetryableParseError,
+    build_grade_request,
+    build_image_request,
+    decode_images,
+    parse_grade,
+    payload_stats,
+    response_output_text,
+    usage_stats,
+)
+from .pipeline import (
+    Candidate,
+    GenerationContext,
+    RunConfig,
+    RunState,
+    approve,
+    checkpoint_candidate,
+    finish_round,
+    generation_context,
+    resume_slide,
+)
+from .prompting import build_prompt
+from .store import run_lock
+from .utils import ensure_dir, load_json, ordered_slides, save_json
+
+
+BATCH_DIR_NAME = "batches"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+IMAGES_ENDPOINT = "/v1/images/generations"
+RESPONSES_ENDPOINT = "/v1/responses"
+# The Batch API takes at most 50,000 requests and 200 MB per input file. Grade requests
+# carry a base64 image each, so a large deck is split well before the byte limit.
+BATCH_MAX_REQUESTS = 50_000
+BATCH_MAX_BYTES = 180 * 1024 * 1024
+
+
+async def generate_batch(
+    configs: list[RunConfig],
+    *,
+    poll_seconds: float = 30.0,
+    batch_images: bool = False,
+) -> None:
+    if not configs:
+        raise RuntimeError("No runs to generate.")
+    async with generation_context(configs[0]) as context:
+        for config in configs:
+            state = RunState(config.run_root)
+            with run_lock(config.run_root):
+                try:
+                    await _batch_run(
+                        config=config,
+                        state=state,
+                        context=context,
+                        poll_seconds=poll_seconds,
+                        batch_images=batch_images,
+                    )
+                finally:
+                    await state.checkpoint()
+
+
+async def _batch_run(
+    *,
+    config: RunConfig,
+    state: RunState,
+    context: GenerationContext,
+    poll_seconds: float,
+    batch_images: bool,
+) -> None:
+    batch_dir = config.run_root / BATCH_DIR_NAME
+    ensure_dir(batch_dir)
+    client = context.client or FakeBatchClient(batch_dir / "fake", config.fake or FakeOptions())
+    final_dir = config.run_root / "final"
+    slides = [
+        slide
+        for slide in ordered_slides(state.slides.get("slides", []))
+        if not (slide.get("status") == "approved" and (final_dir / f"{slide['id']}.png").exists())
+    ]
+    for slide in slides:
+        if not slide.get("rubric"):
+            raise RuntimeError(f"Slide {slide['id']} is missing a rubric.")
+        ensure_dir(config.run_root / "attempts" / slide["id"])
+
+    # Step 1: first-round images for slides that have never been attempted.
+    fresh = [
+        slide for slide in slides if not any((config.run_root / "attempts" / slide["id"]).glob("attempt_*"))
+    ]
+    count = max(config.candidates, 1)
+    if config.max_attempts > 0:
+        count = min(count, config.max_attempts)
+    image_requests = {
+        slide["id"]: build_image_request(
+            model=config.image_model,
+            prompt=slide.get("prompt") or build_prompt(state.spec, slide),
+            size=slide.get("image_size") or state.spec.get("image_size", "1536x1024"),
+            quality=config.image_quality,
+            background=config.image_background,
+            n=count,
+        )
+        for slide in fresh
+    }
+    if image_requests and batch_images:
+        bodies = await run_batch(
+            client,
+            batch_dir=batch_dir,
+            name="images",
+            endpoint=IMAGES_ENDPOINT,
+            requests=image_requests.items(),
+            poll_seconds=poll_seconds,
+        )
+        images = {slide_id: decode_images(body) for slide_id, body in bodies.items()}
+    elif image_requests:
+        generated = await asyncio.gather(
+            *(
+                context.image_client.generate_images(**request, variant=1)
+                for request in image_requests.values()
+            )
+        )
+        images = dict(zip(image_requests, generated))
+    else:
+        images = {}
+    for slide in fresh:
+        for attempt, image in enumerate(images.get(slide["id"], []), start=1):
+            checkpoint_candidate(
+                attempt_dir=config.run_root / "attempts" / slide["id"],
+                attempt=attempt,
+                image_bytes=image.data,
+                prompt=image_requests[slide["id"]]["prompt"],
+                rubric=slide["rubric"],
+                generation={
+                    "image_model": config.image_model,
+                    "image_quality": config.image_quality,
+                    "size": image_requests[slide["id"]]["size"],
+                    "batch": batch_images,
+                },
+            )
+    clear_batch(batch_dir, "images")
+
+    # Step 2: grade every checkpointed, ungraded attempt in one batch.
+    rounds: dict[str, tuple[dict[str, Any], str, list[Candidate]]] = {}
+    for slide in slides:
+        base_prompt = slide.get("prompt") or build_prompt(state.spec, slide)
+        resumed = resume_slide(config=config, state=state, slide=slide, base_prompt=base_prompt)
+        if resumed.passing is not None:
+            await approve(config=config, state=state, slide=slide, image_path=resumed.passing)
+        elif resumed.pending:
+            rounds[slide["id"]] = (slide, base_prompt, resumed.pending)
+
+    options = context.grader.image_options
+    stats: dict[str, dict[str, Any]] = {}
+
+    def grade_requests() -> Iterator[tuple[str, dict[str, Any]]]:
+        # Built lazily as the input files are written, so one encoded image is alive at a time.
+        for slide_id, (slide, _, candidates) in rounds.items():
+            for candidate in candidates:
+                custom_id = f"{slide_id}/{candidate.image_path.stem}"
+                encoded = encode_for_grading(candidate.image_bytes, options)
+                stats[custom_id] = payload_stats(encoded, candidate.image_bytes, options.detail)
+                candidate.release()
+                yield custom_id, build_grade_request(
+                    model=config.grader_model,
+                    rubric=slide["rubric"],
+                    prompt=candidate.prompt,
+                    slide_title=slide.get("title", slide_id),
+                    encoded=encoded,
+                    detail=options.detail,
+                )
+
+    if not rounds:
+        clear_batch(batch_dir, "grades")
+        return
+    bodies = await run_batch(
+        client,
+        batch_dir=batch_dir,
+        name="grades",
+        endpoint=RESPONSES_ENDPOINT,
+        requests=grade_requests(),
+        poll_seconds=poll_seconds,
+    )
+
+    # Step 3: merge grades into attempts/ and index.json exactly as _process_slide would.
+    for slide_id, (slide, base_prompt, candidates) in rounds.items():
+        graded: list[tuple[Candidate, GradeResult]] = []
+        for candidate in candidates:
+            custom_id = f"{slide_id}/{candidate.image_path.stem}"
+            body = bodies.get(custom_id)
+            if body is None:
+                continue
+            try:
+                # Payload stats only exist for requests written by this invocation, not resumed ones.
+                payload = {**stats.get(custom_id, {}), **usage_stats(body.get("usage")), "batch": True}
+                grade = parse_grade(response_output_text(body), payload)
+            except RetryableParseError:
+                continue
+            graded.append((candidate, grade))
+        if graded:
+            await finish_round(
+                config=config,
+                state=state,
+                slide=slide,
+                rubric=slide["rubric"],
+                base_prompt=base_prompt,
+                prompt=candidates[0].prompt,
+                graded=graded,
+            )
+    # Only now is the batch safe to forget: a crash during the merge resumes from its output.
+    clear_batch(batch_dir, "grades")
+
+
+def write_batch_inputs(
+    batch_dir: Path,
+    name: str,
+    endpoint: str,
+    requests: Iterable[tuple[str, dict[str, Any]]],
+) -> list[Path]:
+    paths: list[Path] = []
+    handle = None
+    count = size = 0
+    try:
+        for custom_id, body in requests:
+            line = json.dumps(
+                {"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body},
+                ensure_ascii=True,
+            ).encode("ascii") + b"\n"
+            if handle is None or count >= BATCH_MAX_REQUESTS or size + len(line) > BATCH_MAX_BYTES:
+                if handle is not None:
+                    handle.close()
+                paths.append(batch_dir / f"{name}_input_{len(paths) + 1}.jsonl")
+                handle = paths[-1].open("wb")
+                count = size = 0
+            handle.write(line)
+            count += 1
+            size += len(line)
+    finally:
+        if handle is not None:
+            handle.close()
+    return paths
+
+
+def clear_batch(batch_dir: Path, name: str) -> None:
+    (batch_dir / f"{name}.json").unlink(missing_ok=True)
+
+
+async def run_batch(
+    client: AsyncOpenAI | FakeBatchClient,
+    *,
+    batch_dir: Path,
+    name: str,
+    endpoint: str,
+    requests: Iterable[tuple[str, dict[str, Any]]],
+    poll_seconds: float,
+) -> dict[str, dict[str, Any]]:
+    state_path = batch_dir / f"{name}.json"
+    record = load_json(state_path, None)
+    # Batches submitted by an earlier invocation are picked up again rather than resubmitted;
+    # requests they do not cover stay pending for the next pass. The caller clears the state
+    # with clear_batch once the results are merged.
+    if record is not None and "parts" not in record:
+        record = {"endpoint": record["endpoint"], "parts": [record]}
+    if record is None:
+        paths = write_batch_inputs(batch_dir, name, endpoint, requests)
+        record = {"endpoint": endpoint, "parts": [{"input": path.name} for path in paths]}
+        save_json(state_path, record)
+    for part in record["parts"]:
+        if "batch_id" in part:
+            continue
+        with (batch_dir / part["input"]).open("rb") as handle:
+            uploaded = await client.files.create(file=handle, purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=record["endpoint"],
+            completion_window="24h",
+        )
+        part.update({"batch_id": batch.id, "input_file_id": uploaded.id})
+        save_json(state_path, record)
+
+    results: dict[str, dict[str, Any]] = {}
+    statuses = []
+    for part in record["parts"]:
+        while True:
+            batch = await client.batches.retrieve(part["batch_id"])
+            if batch.status in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(poll_seconds)
+        statuses.append(batch.status)
+        if not batch.output_file_id:
+            continue
+        output_path = batch_dir / f"{name}_{part['batch_id']}_output.jsonl"
+        if output_path.exists():
+            text = output_path.read_text(encoding="utf-8")
+        else:
+            text = (await client.files.content(batch.output_file_id)).text
+            output_path.write_text(text, encoding="utf-8")
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                results[item["custom_id"]] = response.get("body") or {}
+    if not results and any(status != "completed" for status in statuses):
+        # Nothing to merge, so the next pass resubmits from scratch.
+        clear_batch(batch_dir, name)
+        batch_ids = ", ".join(part["batch_id"] for part in record["parts"])
+        raise RuntimeError(f"Batch {batch_ids} ended with status {', '.join(statuses)}")
+    return results
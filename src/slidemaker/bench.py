@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from .fake import FakeOptions
+from .history import percentile
+from .metrics import read_metrics
+from .pipeline import RunConfig, generate_runs
+from .store import ensure_run_dirs, load_index, save_slides, save_spec
+
+
+@dataclass
+class BenchResult:
+    concurrency: int
+    slides: int
+    attempts: int
+    seconds: float
+    slide_p50: float
+    slide_p99: float
+    rate_limited: int
+    peak_rss_mb: float
+
+    @property
+    def slides_per_minute(self) -> float:
+        return self.slides / self.seconds * 60 if self.seconds else 0.0
+
+    @property
+    def attempts_per_minute(self) -> float:
+        return self.attempts / self.seconds * 60 if self.seconds else 0.0
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere.
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _bench_level(config: RunConfig, slides: int) -> BenchResult:
+    with tempfile.TemporaryDirectory(prefix="slidemaker-bench-") as tmp:
+        run_root = ensure_run_dirs(Path(tmp), "bench")["root"]
+        save_spec(run_root, {"topic": "bench", "image_size": "1536x1024"})
+        save_slides(
+            run_root,
+            {
+                "slides": [
+                    {
+                        "id": f"{index:03d}_bench",
+                        "order": index,
+                        "title": f"Bench slide {index}",
+                        "prompt": f"Synthetic benchmark slide {index}",
+                        "rubric": ["Title is legible", "No extra text", "Layout matches prompt"],
+                    }
+                    for index in range(1, slides + 1)
+                ]
+            },
+        )
+        config = replace(config, run_root=run_root)
+        start = time.time()
+        asyncio.run(generate_runs([config]))
+        seconds = time.time() - start
+
+        # A slide is done when it is approved, grading and refinement included.
+        index = load_index(run_root).get("slides", {})
+        completions = [entry["approved_at"] - start for entry in index.values() if entry.get("approved_at")]
+        return BenchResult(
+            concurrency=config.concurrency,
+            slides=len(completions),
+            attempts=sum(len(entry.get("attempts", [])) for entry in index.values()),
+            seconds=seconds,
+            slide_p50=percentile(completions, 50) or 0.0,
+            slide_p99=percentile(completions, 99) or 0.0,
+            rate_limited=sum(record.get("rate_limited", 0) for record in read_metrics(run_root)),
+            peak_rss_mb=_peak_rss_mb(),
+        )
+
+
+def run_bench(
+    *,
+    slides: int,
+    concurrency_levels: list[int],
+    fake: FakeOptions,
+    candidates: int = 1,
+    precheck: bool = False,
+) -> list[BenchResult]:
+    results = []
+    for concurrency in concurrency_levels:
+        config = RunConfig(
+            run_root=Path("."),
+            image_model="fake-image",
+            grader_model="fake-grader",
+            image_quality="auto",
+            image_background="opaque",
+            max_attempts=0,
+            concurrency=concurrency,
+            candidates=candidates,
+            backend="fake",
+            fake=fake,
+            precheck=precheck,
+        )
+        # A fresh process per level so peak RSS is not carried over between levels.
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results.append(pool.submit(_bench_level, config, slides).result())
+    return results
+
+
+def format_results(results: list[BenchResult]) -> str:
+    header = ("concurrency", "slides/min", "attempts/min", "p50 slide", "p99 slide", "429s", "peak RSS")
+    rows: list[tuple[Any, ...]] = [header]
+    for result in results:
+        rows.append(
+            (
+                result.concurrency,
+                f"{result.slides_per_minute:.1f}",
+                f"{result.attempts_per_minute:.1f}",
+                f"{result.slide_p50:.1f}s",
+                f"{result.slide_p99:.1f}s",
+                result.rate_limited,
+                f"{result.peak_rss_mb:.0f} MB",
+            )
+        )
+    widths = [max(len(str(row[column])) for row in rows) for column in range(len(header))]
+    return "\n".join(
+        "  ".join(str(value).rjust(width) for value, width in zip(row, widths)) for row in rows
+    )
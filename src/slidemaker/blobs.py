@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from .cache import content_hash
+from .utils import ensure_dir, link_or_copy, load_json
+
+
+BLOB_DIR_NAME = "blobs"
+ARCHIVE_DIR_NAME = "final_archive"
+IMAGE_DIRS = ("attempts", "final", ARCHIVE_DIR_NAME)
+
+
+def blob_path(run_root: Path, digest: str) -> Path:
+    return run_root / BLOB_DIR_NAME / f"{digest}.png"
+
+
+def store_blob(run_root: Path, data: bytes) -> Path:
+    path = blob_path(run_root, content_hash(data))
+    if not path.exists():
+        ensure_dir(path.parent)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+def write_image(run_root: Path, path: Path, data: bytes) -> None:
+    # Every image in a run is a hardlink to its blob, so identical attempts, final/ and
+    # archive copies share one set of bytes on disk.
+    link_or_copy(store_blob(run_root, data), path)
+
+
+def _same_file(left: Path, right: Path) -> bool:
+    try:
+        return os.path.samefile(left, right)
+    except OSError:
+        return False
+
+
+@dataclass
+class GcPolicy:
+    # None keeps everything of that kind.
+    keep_failed: int | None = None
+    keep_archives: int | None = None
+    dry_run: bool = False
+
+
+@dataclass
+class GcReport:
+    deduped: int = 0
+    deduped_bytes: int = 0
+    attempts_pruned: int = 0
+    archives_pruned: int = 0
+    blobs_removed: int = 0
+    freed_bytes: int = 0
+
+
+def _dedupe(run_root: Path, policy: GcPolicy, report: GcReport) -> None:
+    # Tracked separately from blobs/ so a dry run, which creates no blobs, still spots duplicates.
+    seen: set[str] = set()
+    for name in IMAGE_DIRS:
+        for path in sorted((run_root / name).rglob("*.png")):
+            digest = content_hash(path.read_bytes())
+            blob = blob_path(run_root, digest)
+            first = digest not in seen
+            seen.add(digest)
+            if _same_file(path, blob):
+                continue
+            if first and not blob.exists():
+                if not policy.dry_run:
+                    ensure_dir(blob.parent)
+                    link_or_copy(path, blob)
+                continue
+            report.deduped += 1
+            if path.stat().st_nlink == 1:
+                report.deduped_bytes += path.stat().st_size
+            if not policy.dry_run:
+                link_or_copy(blob, path)
+
+
+def _failed_attempts(run_root: Path, keep_failed: int | None) -> list[Path]:
+    attempts_root = run_root / "attempts"
+    if keep_failed is None or not attempts_root.exists():
+        return []
+    doomed: list[Path] = []
+    for attempt_dir in sorted(attempts_root.iterdir()):
+        failed = []
+        for metadata_path in sorted(attempt_dir.glob("attempt_*.json")):
+            grade = load_json(metadata_path, {}).get("grade")
+            image_path = metadata_path.with_suffix(".png")
+            # Ungraded attempts are pending work, and passing ones may be the final image.
+            if grade and not grade.get("pass") and image_path.exists():
+                failed.append(image_path)
+        doomed.extend(failed[: max(len(failed) - keep_failed, 0)])
+    return doomed
+
+
+def _stale_archives(run_root: Path, keep_archives: int | None) -> list[Path]:
+    archive_root = run_root / ARCHIVE_DIR_NAME
+    if keep_archives is None or not archive_root.exists():
+        return []
+    archives = sorted(path for path in archive_root.iterdir() if path.is_dir())
+    return archives[: max(len(archives) - keep_archives, 0)]
+
+
+def _sweep_blobs(run_root: Path, policy: GcPolicy, report: GcReport, pruned: set[Path]) -> None:
+    blob_root = run_root / BLOB_DIR_NAME
+    if policy.dry_run:
+        # Nothing has been linked or unlinked yet, so compare content instead of link counts.
+        sizes = {blob.stem: blob.stat().st_size for blob in blob_root.glob("*.png")}
+        surviving: set[str] = set()
+        for name in IMAGE_DIRS:
+            for path in (run_root / name).rglob("*.png"):
+                digest = content_hash(path.read_bytes())
+                sizes.setdefault(digest, path.stat().st_size)
+                if path not in pruned and not any(parent in pruned for parent in path.parents):
+                    surviving.add(digest)
+        doomed = set(sizes) - surviving
+        report.blobs_removed = len(doomed)
+        report.freed_bytes = sum(sizes[digest] for digest in doomed)
+        return
+    for blob in sorted(blob_root.glob("*.png")):
+        stat = blob.stat()
+        # Every reference is a hardlink, so a blob nothing else links to is garbage.
+        if stat.st_nlink == 1:
+            report.blobs_removed += 1
+            report.freed_bytes += stat.st_size
+            blob.unlink()
+
+
+def collect_garbage(run_root: Path, policy: GcPolicy) -> GcReport:
+    report = GcReport()
+    _dedupe(run_root, policy, report)
+    failed = _failed_attempts(run_root, policy.keep_failed)
+    archives = _stale_archives(run_root, policy.keep_archives)
+    report.attempts_pruned = len(failed)
+    report.archives_pruned = len(archives)
+    if not policy.dry_run:
+        # Metadata stays behind so index.json, history and prompt refinement keep working.
+        for image_path in failed:
+            image_path.unlink()
+        for archive in archives:
+            shutil.rmtree(archive)
+    _sweep_blobs(run_root, policy, report, set(failed) | set(archives))
+    return report
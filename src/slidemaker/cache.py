@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from .utils import ensure_dir
+
+
+CACHE_ENV = "SLIDEMAKER_CACHE_DIR"
+
+
+def cache_key(kind: str, **params: Any) -> str:
+    payload = json.dumps({"kind": kind, **params}, sort_keys=True, ensure_ascii=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, root: Path, max_bytes: int = 2 * 1024**3) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes: int | None = None
+        ensure_dir(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # mtime doubles as the LRU clock.
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        ensure_dir(path.parent)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def get_json(self, key: str) -> Any | None:
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def put_json(self, key: str, value: Any) -> None:
+        self.put(key, json.dumps(value, ensure_ascii=True).encode("utf-8"))
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob("??/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        # Trim below the limit so a full cache doesn't rescan on every write.
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self.total_bytes = total
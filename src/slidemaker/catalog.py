@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+
+CATALOG_NAME = "catalog.sqlite"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    topic TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    slides INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status, created_at);
+"""
+
+
+@dataclass
+class RunSummary:
+    run_id: str
+    topic: str | None
+    created_at: float
+    updated_at: float
+    status: str
+    slides: int
+    approved: int
+    attempts: int
+    passed: int
+
+    @property
+    def pass_rate(self) -> float | None:
+        return self.passed / self.attempts if self.attempts else None
+
+
+def run_created_at(run_root: Path) -> float:
+    # Default run ids start with a UTC timestamp; anything else falls back to the spec's mtime.
+    try:
+        stamp = dt.datetime.strptime(run_root.name[:15], "%Y%m%d_%H%M%S")
+        return stamp.replace(tzinfo=dt.timezone.utc).timestamp()
+    except ValueError:
+        spec = run_root / "spec.json"
+        return (spec if spec.exists() else run_root).stat().st_mtime
+
+
+def run_status(slides: list[dict[str, Any]], attempts: int) -> str:
+    if not slides:
+        return "new"
+    if all(slide.get("status") == "approved" for slide in slides):
+        return "complete"
+    return "incomplete" if attempts else "draft"
+
+
+class RunCatalog:
+    def __init__(self, runs_dir: Path) -> None:
+        self.path = runs_dir / CATALOG_NAME
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Several generate processes may update the catalog at once; wait out their locks.
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SCHEMA)
+        return conn
+
+    def record(
+        self,
+        run_root: Path,
+        slides: list[dict[str, Any]],
+        index: dict[str, Any],
+        *,
+        topic: str | None = None,
+        status: str | None = None,
+    ) -> None:
+        attempts = [attempt for entry in index.get("slides", {}).values() for attempt in entry.get("attempts", [])]
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO runs (run_id, topic, created_at, updated_at, status, slides, approved, attempts, passed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id) DO UPDATE SET
+                    topic = COALESCE(excluded.topic, runs.topic),
+                    updated_at = excluded.updated_at,
+                    status = excluded.status,
+                    slides = excluded.slides,
+                    approved = excluded.approved,
+                    attempts = excluded.attempts,
+                    passed = excluded.passed
+                """,
+                (
+                    run_root.name,
+                    topic,
+                    run_created_at(run_root),
+                    now,
+                    status or run_status(slides, len(attempts)),
+                    len(slides),
+                    sum(1 for slide in slides if slide.get("status") == "approved"),
+                    len(attempts),
+                    sum(1 for attempt in attempts if attempt.get("pass")),
+                ),
+            )
+
+    def latest(self) -> str | None:
+        if not self.exists():
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT run_id FROM runs ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row["run_id"] if row else None
+
+    def runs(
+        self,
+        *,
+        statuses: list[str] | None = None,
+        since: float | None = None,
+        limit: int | None = None,
+    ) -> Iterator[RunSummary]:
+        if not self.exists():
+            return
+        clauses = []
+        params: list[Any] = []
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        query = "SELECT * FROM runs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            for row in conn.execute(query, params).fetchall():
+                yield RunSummary(**dict(row))
+
+    def forget(self, run_id: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
@@ -2,23 +2,39 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
+import os
+from dataclasses import replace
 from pathlib import Path
 
+from .backends import BACKENDS
+from .blobs import GcPolicy, collect_garbage
+from .cache import CACHE_ENV
+from .dedupe import DEFAULT_DISTANCE, find_duplicates, format_report
 from .exporter import export_pdf
-from .pipeline import RunConfig, generate_all
+from .fake import FakeOptions
+from .history import Prices, build_history
+from .metrics import read_metrics, render_metrics
+from .pipeline import RunConfig, generate_runs
+from .prefilter import CHECKS, DEFAULT_CHECKS
 from .prompting import build_prompt, build_rubric, slide_id
 from .report import build_report
 from .store import (
+    all_run_ids,
+    catalog,
     ensure_run_dirs,
     latest_run_id,
     load_slides,
     load_spec,
+    pending_run_ids,
+    rebuild_catalog,
+    refresh_catalog,
     run_dir,
+    runs_root,
     save_outline,
     save_slides,
     save_spec,
 )
-from .utils import chunk_lines, ensure_dir, read_text, size_from_aspect
+from .utils import chunk_lines, ensure_dir, read_text, size_from_aspect, write_text
 
 
 def main() -> None:
@@ -39,16 +55,114 @@ def main() -> None:
     draft_parser.add_argument("--overwrite", action="store_true")
 
     generate_parser = subparsers.add_parser("generate", help="Generate and grade slides")
-    generate_parser.add_argument("--run", required=True)
-    generate_parser.add_argument("--concurrency", type=int, default=4)
-    generate_parser.add_argument("--max-attempts", type=int, default=8)
-    generate_parser.add_argument("--image-model", default="gpt-image-1.5")
-    generate_parser.add_argument("--grader-model", default="gpt-5.1")
-    generate_parser.add_argument("--quality", default="auto", choices=["auto", "low", "medium", "high"])
-    generate_parser.add_argument("--background", default="opaque", choices=["opaque", "transparent", "auto"])
+    run_group = generate_parser.add_mutually_exclusive_group(required=True)
+    run_group.add_argument("--run")
+    run_group.add_argument("--runs", nargs="+", help="Generate several runs in one process")
+    run_group.add_argument(
+        "--all-pending",
+        action="store_true",
+        help="Generate every run that still has unapproved slides",
+    )
+    generate_parser.add_argument(
+        "--priority",
+        action="append",
+        default=[],
+        metavar="RUN=WEIGHT",
+        help="Relative share of the global budget for a run (default weight 1)",
+    )
+    _add_generation_arguments(generate_parser)
+    generate_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Grade first-round attempts through the OpenAI Batch API and merge the results",
+    )
+    generate_parser.add_argument(
+        "--batch-images",
+        action="store_true",
+        help="With --batch, also submit first-round image generation as a batch",
+    )
+    generate_parser.add_argument("--batch-poll-seconds", type=float, default=30.0)
+
+    serve_parser = subparsers.add_parser("serve", help="Run a daemon that accepts generate/report jobs over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    serve_parser.add_argument(
+        "--keep-jobs",
+        type=int,
+        default=100,
+        help="Finished jobs kept in memory for GET /jobs; older ones are dropped",
+    )
+    _add_generation_arguments(serve_parser)
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark the scheduler against the fake backend")
+    bench_parser.add_argument("--slides", type=int, default=50)
+    bench_parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[4, 8, 16],
+        help="Concurrency levels to run, each in a fresh process",
+    )
+    bench_parser.add_argument("--candidates", type=int, default=1)
+    bench_parser.add_argument("--precheck", action="store_true", help="Enable the precheck grading tier")
+    _add_fake_arguments(bench_parser)
 
     report_parser = subparsers.add_parser("report", help="Generate HTML report")
     report_parser.add_argument("--run", required=True)
+    report_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes used to render thumbnails (default: all cores)",
+    )
+    report_parser.add_argument(
+        "--history",
+        action="store_true",
+        help="Write history.html with every attempt, latency percentiles and estimated spend",
+    )
+    report_parser.add_argument("--image-price", type=float, help="Override USD per generated image")
+    report_parser.add_argument("--grade-price", type=float, help="Override USD per grader call")
+
+    dedupe_parser = subparsers.add_parser("dedupe", help="Report near-duplicate attempts in a run")
+    dedupe_parser.add_argument("--run", required=True)
+    dedupe_parser.add_argument("--distance", type=int, default=DEFAULT_DISTANCE, help="Max dHash bits apart")
+    dedupe_parser.add_argument("--workers", type=int, help="Processes for hashing older attempts")
+
+    list_parser = subparsers.add_parser("list", help="List runs from the run catalog")
+    list_parser.add_argument(
+        "--status",
+        action="append",
+        choices=["new", "draft", "generating", "incomplete", "complete", "failed"],
+        help="Only show runs with this status (repeatable)",
+    )
+    list_parser.add_argument("--limit", type=int, help="Show at most N runs, newest first")
+    list_parser.add_argument("--since", help="Only runs created on or after this date (YYYY-MM-DD)")
+    list_parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rescan runs/ and rebuild the catalog before listing",
+    )
+
+    gc_parser = subparsers.add_parser("gc", help="Deduplicate images into blobs/ and prune old ones")
+    gc_target = gc_parser.add_mutually_exclusive_group()
+    gc_target.add_argument("--run", help="Run id (defaults to latest)")
+    gc_target.add_argument("--all", action="store_true", help="Collect every run in the catalog")
+    gc_parser.add_argument(
+        "--keep-failed",
+        type=int,
+        help="Keep only the N most recent failed attempt images per slide (metadata is kept)",
+    )
+    gc_parser.add_argument(
+        "--keep-archives",
+        type=int,
+        help="Keep only the N most recent final_archive/ snapshots",
+    )
+    gc_parser.add_argument("--dry-run", action="store_true", help="Report what would change without touching disk")
+
+    metrics_parser = subparsers.add_parser("metrics", help="Dump per-call metrics for scraping")
+    metrics_parser.add_argument("--run", help="Run id (defaults to latest)")
+    metrics_parser.add_argument("--format", choices=["prometheus", "openmetrics"], default="prometheus")
+    metrics_parser.add_argument("--output", help="Write to a file instead of stdout")
 
     export_parser = subparsers.add_parser(
         "export-pdf",
@@ -56,6 +170,37 @@ def main() -> None:
     )
     export_parser.add_argument("--run", help="Run id (defaults to latest)")
     export_parser.add_argument("--output", help="Optional output PDF path")
+    export_parser.add_argument(
+        "--profile",
+        choices=["print", "share"],
+        default="print",
+        help="print embeds lossless pages; share recompresses pages as JPEG",
+    )
+    export_parser.add_argument(
+        "--jpeg-quality",
+        type=int,
+        help="JPEG quality for the share profile (default: 75)",
+    )
+    export_parser.add_argument(
+        "--dpi",
+        type=float,
+        help="Pixels per inch used to size pages (default: 96)",
+    )
+    export_parser.add_argument(
+        "--page-width",
+        type=int,
+        help="Downscale pages wider than this many pixels (share default: 1280; 0 keeps full size)",
+    )
+    export_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes used to encode pages (default: all cores)",
+    )
+    export_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-encode every page instead of reusing exports/.cache",
+    )
 
     args = parser.parse_args()
     base_dir = Path.cwd()
@@ -83,6 +228,7 @@ def main() -> None:
 
         slides = {"spec": spec, "slides": []}
         save_slides(paths["root"], slides)
+        refresh_catalog(paths["root"])
         print(f"Run created: {paths['root']}")
         return
 
@@ -98,6 +244,7 @@ def main() -> None:
         slides["spec"] = load_spec(run_root)
         slides["slides"] = outline["slides"]
         save_slides(run_root, slides)
+        refresh_catalog(run_root)
         print(f"Outline created with {len(outline['slides'])} slides")
         return
 
@@ -114,45 +261,364 @@ def main() -> None:
             updated += 1
         slides["spec"] = spec
         save_slides(run_root, slides)
+        refresh_catalog(run_root)
         print(f"Drafted prompts/rubrics for {updated} slides")
         return
 
     if args.command == "generate":
-        run_root = run_dir(base_dir, args.run)
-        config = RunConfig(
-            run_root=run_root,
-            image_model=args.image_model,
-            grader_model=args.grader_model,
-            image_quality=args.quality,
-            image_background=args.background,
-            max_attempts=args.max_attempts,
-            concurrency=args.concurrency,
-        )
-        ensure_dir(run_root)
-        ensure_dir(run_root / "attempts")
-        ensure_dir(run_root / "final")
+        if args.all_pending:
+            run_ids = pending_run_ids(base_dir)
+            if not run_ids:
+                print("No pending runs")
+                return
+        else:
+            run_ids = args.runs or [args.run]
+        priorities = _parse_priorities(args.priority)
+        config = _run_config(args, run_dir(base_dir, run_ids[0]))
+        configs = []
+        for run_id in run_ids:
+            run_root = run_dir(base_dir, run_id)
+            ensure_dir(run_root)
+            ensure_dir(run_root / "attempts")
+            ensure_dir(run_root / "final")
+            configs.append(replace(config, run_root=run_root, priority=priorities.get(run_id, 1.0)))
         import asyncio
 
-        asyncio.run(generate_all(config))
+        if args.batch:
+            from .batch import generate_batch
+
+            asyncio.run(
+                generate_batch(
+                    configs,
+                    poll_seconds=args.batch_poll_seconds,
+                    batch_images=args.batch_images,
+                )
+            )
+            print("Batch grading merged")
+            return
+        asyncio.run(generate_runs(configs))
         print("Generation complete")
         return
 
+    if args.command == "serve":
+        import asyncio
+
+        from .server import serve
+
+        config = _run_config(args, runs_root(base_dir))
+        try:
+            asyncio.run(
+                serve(
+                    config,
+                    base_dir,
+                    host=args.host,
+                    port=args.port,
+                    socket_path=Path(args.socket) if args.socket else None,
+                    keep_jobs=args.keep_jobs,
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        return
+
     if args.command == "report":
         run_root = run_dir(base_dir, args.run)
         slides = load_slides(run_root).get("slides", [])
-        report_path = build_report(run_root, slides)
+        if args.history:
+            prices = Prices(image=args.image_price, grade=args.grade_price)
+            report_path = build_history(run_root, slides, prices=prices, workers=args.workers)
+        else:
+            report_path = build_report(run_root, slides, workers=args.workers)
         print(f"Report written to {report_path}")
         return
 
+    if args.command == "bench":
+        from .bench import format_results, run_bench
+
+        results = run_bench(
+            slides=args.slides,
+            concurrency_levels=args.concurrency,
+            fake=_fake_options(args),
+            candidates=args.candidates,
+            precheck=args.precheck,
+        )
+        print(format_results(results))
+        return
+
+    if args.command == "dedupe":
+        report = find_duplicates(run_dir(base_dir, args.run), distance=args.distance, workers=args.workers)
+        print(format_report(report))
+        return
+
+    if args.command == "list":
+        runs = catalog(base_dir)
+        if args.rebuild or not runs.exists():
+            rebuild_catalog(base_dir)
+        since = None
+        if args.since:
+            since = dt.datetime.strptime(args.since, "%Y-%m-%d").replace(tzinfo=dt.timezone.utc).timestamp()
+        for summary in runs.runs(statuses=args.status, since=since, limit=args.limit):
+            created = dt.datetime.fromtimestamp(summary.created_at, dt.timezone.utc).strftime("%Y-%m-%d %H:%M")
+            pass_rate = f"{summary.pass_rate:.0%}" if summary.pass_rate is not None else "-"
+            print(
+                f"{summary.run_id}\t{created}\t{summary.status}\t"
+                f"{summary.approved}/{summary.slides} approved\t{summary.attempts} attempts\t{pass_rate} pass"
+            )
+        return
+
+    if args.command == "gc":
+        if args.all:
+            run_ids = all_run_ids(base_dir)
+        else:
+            run_ids = [args.run or latest_run_id(base_dir)]
+        policy = GcPolicy(keep_failed=args.keep_failed, keep_archives=args.keep_archives, dry_run=args.dry_run)
+        prefix = "Would free" if args.dry_run else "Freed"
+        for run_id in run_ids:
+            report = collect_garbage(run_dir(base_dir, run_id), policy)
+            print(
+                f"{run_id}: {report.deduped} duplicate images linked ({report.deduped_bytes / 1024**2:.1f} MB), "
+                f"{report.attempts_pruned} failed attempts and {report.archives_pruned} archives pruned; "
+                f"{prefix} {report.blobs_removed} blobs ({report.freed_bytes / 1024**2:.1f} MB)"
+            )
+        return
+
+    if args.command == "metrics":
+        run_id = args.run or latest_run_id(base_dir)
+        text = render_metrics(read_metrics(run_dir(base_dir, run_id)), openmetrics=args.format == "openmetrics")
+        if args.output:
+            write_text(Path(args.output), text)
+        else:
+            print(text, end="")
+        return
+
     if args.command == "export-pdf":
         run_id = args.run or latest_run_id(base_dir)
         run_root = run_dir(base_dir, run_id)
         output_path = Path(args.output) if args.output else None
-        pdf_path = export_pdf(run_root, output_path)
+        pdf_path = export_pdf(
+            run_root,
+            output_path,
+            profile=args.profile,
+            jpeg_quality=args.jpeg_quality,
+            dpi=args.dpi,
+            page_width=args.page_width,
+            workers=args.workers,
+            use_cache=not args.no_cache,
+        )
         print(f"PDF written to {pdf_path}")
         return
 
 
+def _run_config(args: argparse.Namespace, run_root: Path) -> RunConfig:
+    return RunConfig(
+        run_root=run_root,
+        image_model=args.image_model,
+        grader_model=args.grader_model,
+        image_quality=args.quality,
+        image_background=args.background,
+        max_attempts=args.max_attempts,
+        concurrency=args.concurrency,
+        candidates=args.candidates,
+        image_concurrency=args.image_concurrency,
+        grade_concurrency=args.grade_concurrency,
+        max_concurrency=args.max_concurrency,
+        cache_dir=None if args.no_cache or not args.cache_dir else Path(args.cache_dir),
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        grade_max_width=args.grade_max_width,
+        grade_format=args.grade_format,
+        grade_quality=args.grade_quality,
+        image_detail=args.image_detail,
+        pool_size=args.pool_size,
+        image_timeout=args.image_timeout,
+        grade_timeout=args.grade_timeout,
+        http2=False if args.no_http2 else None,
+        image_rpm=args.image_rpm,
+        grade_rpm=args.grade_rpm,
+        base_url=args.base_url,
+        backend=args.backend,
+        fake=_fake_options(args),
+        precheck=args.precheck,
+        precheck_model=args.precheck_model,
+        order=args.order,
+        refine_mode=args.refine,
+        edit_rounds=args.edit_rounds,
+        dedupe_distance=None if args.no_dedupe else args.dedupe_distance,
+        prefilter=() if args.no_prefilter else _parse_checks(args.prefilter),
+    )
+
+
+def _add_generation_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--image-concurrency",
+        type=int,
+        help="Starting concurrency for image generation calls (defaults to --concurrency)",
+    )
+    parser.add_argument(
+        "--grade-concurrency",
+        type=int,
+        help="Starting concurrency for grading calls (defaults to --concurrency)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        help="Ceiling the adaptive limiter may grow to (defaults to 4x the starting concurrency)",
+    )
+    parser.add_argument("--max-attempts", type=int, default=8)
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Images to generate and grade per round; the best passing one is kept",
+    )
+    parser.add_argument("--image-model", default="gpt-image-1.5")
+    parser.add_argument("--grader-model", default="gpt-5.1")
+    parser.add_argument(
+        "--order",
+        default="expected",
+        choices=["expected", "outline"],
+        help=(
+            "expected starts slides that past runs suggest will need the most attempts first, judged by "
+            "their rubric, verbatim labels and title/intent words; with no run history it keeps outline order"
+        ),
+    )
+    parser.add_argument(
+        "--refine",
+        default="generate",
+        choices=["generate", "edit"],
+        help="edit revises the best attempt so far with the grader's improvements instead of regenerating",
+    )
+    parser.add_argument(
+        "--edit-rounds",
+        type=int,
+        default=2,
+        help="With --refine edit, fall back to fresh generation after N edit rounds without a better score",
+    )
+    parser.add_argument(
+        "--dedupe-distance",
+        type=int,
+        default=DEFAULT_DISTANCE,
+        help="Reuse the failed grade of an earlier attempt whose dHash is within N of 256 bits",
+    )
+    parser.add_argument("--no-dedupe", action="store_true", help="Grade every attempt, even near-duplicates")
+    parser.add_argument(
+        "--prefilter",
+        default=",".join(DEFAULT_CHECKS),
+        help=f"Comma-separated local checks run before grading ({', '.join(CHECKS)})",
+    )
+    parser.add_argument("--no-prefilter", action="store_true", help="Send every image to the grader")
+    parser.add_argument(
+        "--precheck",
+        action="store_true",
+        help="Screen hard rubric items (No/Only/Exactly ..., or a slide's hard_rubric) at low detail first",
+    )
+    parser.add_argument(
+        "--precheck-model",
+        help="Cheaper model for the precheck tier (defaults to --grader-model)",
+    )
+    parser.add_argument("--quality", default="auto", choices=["auto", "low", "medium", "high"])
+    parser.add_argument("--background", default="opaque", choices=["opaque", "transparent", "auto"])
+
+    parser.add_argument("--base-url", help="Override the OpenAI API base URL (e.g. a local stand-in)")
+    parser.add_argument("--image-rpm", type=float, help="Global image requests per minute")
+    parser.add_argument("--grade-rpm", type=float, help="Global grading requests per minute")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get(CACHE_ENV),
+        help=f"Cache image and grade responses on disk (defaults to ${CACHE_ENV})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    parser.add_argument("--cache-max-mb", type=int, default=2048)
+    parser.add_argument(
+        "--grade-max-width",
+        type=int,
+        default=0,
+        help="Downscale images to this width before grading (0 sends full resolution)",
+    )
+    parser.add_argument("--grade-format", default="png", choices=["png", "jpeg", "webp"])
+    parser.add_argument("--grade-quality", type=int, default=85, help="JPEG/WebP quality for grading")
+    parser.add_argument("--image-detail", default="auto", choices=["auto", "low", "high"])
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        help="Keep-alive connection pool size shared by image and grader calls",
+    )
+    parser.add_argument("--image-timeout", type=float, default=300.0, help="Seconds per image call")
+    parser.add_argument("--grade-timeout", type=float, default=120.0, help="Seconds per grading call")
+    parser.add_argument(
+        "--no-http2",
+        action="store_true",
+        help="Disable HTTP/2 even when the h2 package is installed",
+    )
+    parser.add_argument(
+        "--backend",
+        default="openai",
+        choices=list(BACKENDS),
+        help="fake returns synthetic images and grades locally (see the --fake-* options)",
+    )
+    _add_fake_arguments(parser)
+
+
+def _add_fake_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--fake-image-latency", type=float, default=2.0, help="Mean seconds per fake image call")
+    parser.add_argument("--fake-grade-latency", type=float, default=0.5, help="Mean seconds per fake grade call")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="Fraction of fake calls that return 500")
+    parser.add_argument(
+        "--fake-rate-limit-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of fake calls that return 429",
+    )
+    parser.add_argument("--fake-pass-probability", type=float, default=0.3)
+    parser.add_argument(
+        "--fake-precheck-reject-rate",
+        type=float,
+        default=0.35,
+        help="Fraction of fake prechecks that reject the image",
+    )
+    parser.add_argument(
+        "--fake-batch-latency",
+        type=float,
+        default=5.0,
+        help="Seconds before a fake batch (generate --batch) completes",
+    )
+    parser.add_argument("--fake-seed", type=int)
+
+
+def _fake_options(args: argparse.Namespace) -> FakeOptions:
+    return FakeOptions(
+        image_latency=args.fake_image_latency,
+        grade_latency=args.fake_grade_latency,
+        error_rate=args.fake_error_rate,
+        rate_limit_rate=args.fake_rate_limit_rate,
+        pass_probability=args.fake_pass_probability,
+        precheck_reject_rate=args.fake_precheck_reject_rate,
+        batch_latency=args.fake_batch_latency,
+        seed=args.fake_seed,
+    )
+
+
+def _parse_checks(value: str) -> tuple[str, ...]:
+    checks = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in checks if name not in CHECKS]
+    if unknown:
+        raise SystemExit(f"Unknown prefilter checks: {', '.join(unknown)}")
+    return checks
+
+
+def _parse_priorities(values: list[str]) -> dict[str, float]:
+    priorities: dict[str, float] = {}
+    for value in values:
+        run_id, sep, weight = value.rpartition("=")
+        try:
+            priorities[run_id] = float(weight)
+        except ValueError:
+            run_id = ""
+        if not sep or not run_id:
+            raise SystemExit(f"Invalid --priority {value!r}; expected RUN=WEIGHT")
+    return priorities
+
+
 def _default_run_id(topic: str) -> str:
     timestamp = dt.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     return f"{timestamp}_{_slug(topic)}"
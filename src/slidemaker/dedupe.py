@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .imaging import dhash, hash_distance
+from .store import load_index
+from .utils import load_json
+
+
+# Bits out of the 256-bit dHash. Distinct attempts at the same slide sit 30+ bits apart.
+DEFAULT_DISTANCE = 8
+
+
+@dataclass
+class SeenImage:
+    attempt: str
+    phash: str
+    grade: dict[str, Any]
+
+
+class DuplicateIndex:
+    def __init__(self, distance: int = DEFAULT_DISTANCE) -> None:
+        self.distance = distance
+        self.seen: list[SeenImage] = []
+
+    def add(self, attempt: str, phash: str, grade: dict[str, Any]) -> None:
+        self.seen.append(SeenImage(attempt, phash, grade))
+
+    def match(self, phash: str) -> tuple[SeenImage, int] | None:
+        # Only failures are reused: a passing near-duplicate would have ended the slide already.
+        best: tuple[SeenImage, int] | None = None
+        for item in self.seen:
+            if item.grade.get("pass"):
+                continue
+            distance = hash_distance(phash, item.phash)
+            if distance <= self.distance and (best is None or distance < best[1]):
+                best = (item, distance)
+        return best
+
+
+@dataclass
+class DuplicateGroup:
+    slide_id: str
+    attempts: list[str]
+    distances: list[int] = field(default_factory=list)
+
+
+@dataclass
+class DedupeReport:
+    attempts: int = 0
+    reused: int = 0
+    reused_seconds: float = 0.0
+    groups: list[DuplicateGroup] = field(default_factory=list)
+
+    @property
+    def duplicates(self) -> int:
+        return sum(len(group.attempts) - 1 for group in self.groups)
+
+
+def _hash_file(path: Path) -> str:
+    return dhash(path.read_bytes())
+
+
+def _attempt_hashes(run_root: Path, workers: int | None) -> dict[str, list[tuple[str, str]]]:
+    found: dict[str, list[tuple[str, Any]]] = {}
+    missing: list[tuple[str, int, Path]] = []
+    for attempt_dir in sorted((run_root / "attempts").glob("*")):
+        if not attempt_dir.is_dir():
+            continue
+        entries = found.setdefault(attempt_dir.name, [])
+        for metadata_path in sorted(attempt_dir.glob("attempt_*.json")):
+            image_path = metadata_path.with_suffix(".png")
+            phash = load_json(metadata_path, {}).get("phash")
+            if phash is None:
+                # Attempts from before hashing, or ungraded ones; gc may have pruned the image.
+                if not image_path.exists():
+                    continue
+                missing.append((attempt_dir.name, len(entries), image_path))
+            entries.append((metadata_path.stem, phash))
+    if missing:
+        workers = workers or os.cpu_count() or 1
+        paths = [path for _, _, path in missing]
+        if workers <= 1 or len(paths) <= 1:
+            hashes = [_hash_file(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+                hashes = list(pool.map(_hash_file, paths, chunksize=8))
+        for (slide_id, slot, _), phash in zip(missing, hashes):
+            entries = found[slide_id]
+            entries[slot] = (entries[slot][0], phash)
+    return {slide_id: [(name, phash) for name, phash in entries if phash] for slide_id, entries in found.items()}
+
+
+def find_duplicates(
+    run_root: Path,
+    *,
+    distance: int = DEFAULT_DISTANCE,
+    workers: int | None = None,
+) -> DedupeReport:
+    report = DedupeReport()
+    for slide_id, hashes in _attempt_hashes(run_root, workers).items():
+        report.attempts += len(hashes)
+        groups: list[DuplicateGroup] = []
+        leaders: list[tuple[str, DuplicateGroup]] = []
+        # Each attempt joins the group of the first earlier attempt it is close to.
+        for name, phash in hashes:
+            for leader, group in leaders:
+                gap = hash_distance(phash, leader)
+                if gap <= distance:
+                    group.attempts.append(name)
+                    group.distances.append(gap)
+                    break
+            else:
+                group = DuplicateGroup(slide_id, [name])
+                leaders.append((phash, group))
+                groups.append(group)
+        report.groups.extend(group for group in groups if len(group.attempts) > 1)
+
+    index = load_index(run_root).get("slides", {})
+    for entry in index.values():
+        attempts = entry.get("attempts", [])
+        graded = [attempt.get("grade_seconds", 0.0) for attempt in attempts if "duplicate_of" not in attempt]
+        reused = sum(1 for attempt in attempts if "duplicate_of" in attempt)
+        report.reused += reused
+        if reused and graded:
+            report.reused_seconds += reused * sum(graded) / len(graded)
+    return report
+
+
+def format_report(report: DedupeReport) -> str:
+    lines = [
+        f"{report.attempts} attempts, {report.duplicates} near-duplicates in {len(report.groups)} groups",
+        f"{report.reused} grades reused without a grader call (~{report.reused_seconds:.0f}s of grading saved)",
+    ]
+    for group in report.groups:
+        pairs = ", ".join(f"{name} (+{gap})" for name, gap in zip(group.attempts[1:], group.distances))
+        lines.append(f"  {group.slide_id}: {group.attempts[0]} ~ {pairs}")
+    return "\n".join(lines)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .catalog import RunCatalog
+from .prompting import hard_rubric
+from .store import load_index, load_slides, load_spec, rebuild_catalog
+
+
+# Pass rate assumed for a feature nothing in the history has exercised yet.
+PRIOR_PASS_RATE = 0.5
+# Pseudo-attempts of the prior blended into each feature's observed pass rate.
+PRIOR_WEIGHT = 5.0
+DEFAULT_ROUND_SECONDS = 60.0
+HISTORY_RUNS = 50
+# Title and intent words shared by too many slides to tell them apart.
+STOPWORDS = frozenset(
+    {
+        "about", "after", "also", "than", "that", "their", "them", "then", "there", "these",
+        "this", "what", "when", "where", "which", "while", "with", "your", "from", "into",
+        "over", "show", "shows", "slide", "section", "opener", "same", "more", "most", "just",
+    }
+)
+MAX_WORDS = 12
+
+
+@dataclass
+class SlideEstimate:
+    pass_rate: float
+    rounds: float
+    seconds: float
+
+
+@dataclass
+class AttemptHistory:
+    attempts: dict[str, int] = field(default_factory=dict)
+    passes: dict[str, int] = field(default_factory=dict)
+    round_seconds: list[float] = field(default_factory=list)
+
+    def add(self, feature: str, attempts: int, passes: int) -> None:
+        self.attempts[feature] = self.attempts.get(feature, 0) + attempts
+        self.passes[feature] = self.passes.get(feature, 0) + passes
+
+    def pass_rate(self, feature: str, prior: float) -> float:
+        attempts = self.attempts.get(feature, 0)
+        return (self.passes.get(feature, 0) + prior * PRIOR_WEIGHT) / (attempts + PRIOR_WEIGHT)
+
+
+def slide_words(slide: dict[str, Any]) -> list[str]:
+    text = " ".join(str(slide.get(key) or "") for key in ("title", "intent")).lower()
+    words: list[str] = []
+    for word in re.findall(r"[a-z][a-z0-9]{3,}", text):
+        if word not in STOPWORDS and word not in words:
+            words.append(word)
+    return words[:MAX_WORDS]
+
+
+def verbatim_labels(slide: dict[str, Any]) -> set[str]:
+    text = " ".join([slide.get("prompt") or "", *(slide.get("rubric") or [])])
+    return {single or double for single, double in re.findall(r"'([^']+)'|\"([^\"]+)\"", text)}
+
+
+def slide_features(spec: dict[str, Any], slide: dict[str, Any]) -> list[str]:
+    rubric = slide.get("rubric") or []
+    # Every exact string the image must render is another chance to misspell one.
+    features = [f"rubric_{min(len(rubric), 8)}", f"labels_{min(len(verbatim_labels(slide)), 4)}"]
+    if spec.get("allow_text") is False:
+        features.append("no_text")
+    # Quoted strings are text the image must render verbatim, which image models often miss.
+    if any("'" in item or '"' in item for item in rubric):
+        features.append("quoted_text")
+    if hard_rubric(slide, rubric):
+        features.append("hard_rubric")
+    return features
+
+
+def load_history(runs_dir: Path, limit: int = HISTORY_RUNS) -> AttemptHistory:
+    history = AttemptHistory()
+    runs = RunCatalog(runs_dir)
+    if not runs.exists():
+        # Trees from before the catalog would otherwise contribute no history at all.
+        rebuild_catalog(runs_dir.parent)
+    for summary in runs.runs(limit=limit):
+        run_root = runs_dir / summary.run_id
+        entries = load_index(run_root).get("slides", {})
+        if not entries:
+            continue
+        spec = load_spec(run_root)
+        for slide in load_slides(run_root).get("slides", []):
+            attempts = entries.get(slide.get("id"), {}).get("attempts", [])
+            if not attempts:
+                continue
+            passes = sum(1 for attempt in attempts if attempt.get("pass"))
+            history.add("all", len(attempts), passes)
+            history.add(f"slide:{summary.run_id}/{slide['id']}", len(attempts), passes)
+            for feature in slide_features(spec, slide):
+                history.add(feature, len(attempts), passes)
+            for word in slide_words(slide):
+                history.add(f"word:{word}", len(attempts), passes)
+            for attempt in attempts:
+                seconds = attempt.get("generate_seconds", 0.0) + attempt.get("grade_seconds", 0.0)
+                if seconds:
+                    history.round_seconds.append(seconds + attempt.get("precheck_seconds", 0.0))
+    return history
+
+
+def estimate_slides(
+    run_root: Path,
+    spec: dict[str, Any],
+    slides: list[dict[str, Any]],
+    history: AttemptHistory,
+    *,
+    candidates: int = 1,
+    max_attempts: int = 0,
+) -> dict[str, SlideEstimate]:
+    prior = history.pass_rate("all", PRIOR_PASS_RATE)
+    round_seconds = (
+        sum(history.round_seconds) / len(history.round_seconds) if history.round_seconds else DEFAULT_ROUND_SECONDS
+    )
+    candidates = max(candidates, 1)
+    estimates = {}
+    for slide in slides:
+        features = slide_features(spec, slide) + [f"slide:{run_root.name}/{slide['id']}"]
+        rates = [history.pass_rate(feature, prior) for feature in features]
+        # Subject matter seen in earlier decks ("capacity", "wafer") is averaged, not minimised:
+        # any one word says little, but together they place a new slide near similar ones.
+        words = [f"word:{word}" for word in slide_words(slide) if history.attempts.get(f"word:{word}")]
+        if words:
+            rates.append(sum(history.pass_rate(word, prior) for word in words) / len(words))
+        # The hardest constraint a slide carries dominates how long it takes to pass.
+        pass_rate = min(rates)
+        round_pass = 1 - (1 - pass_rate) ** candidates
+        rounds = 1 / max(round_pass, 1e-6)
+        if max_attempts > 0:
+            rounds = min(rounds, math.ceil(max_attempts / candidates))
+        estimates[slide["id"]] = SlideEstimate(pass_rate=pass_rate, rounds=rounds, seconds=rounds * round_seconds)
+    return estimates
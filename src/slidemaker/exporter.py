@@ -1,15 +1,37 @@
 from __future__ import annotations
 
 import datetime as dt
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import replace
 from pathlib import Path
+from typing import Iterator
 
-import img2pdf
-
+from .pdf import PROFILES, EncodedPage, PageEncoding, StreamingPdfWriter, prepare_page
 from .store import load_slides
 from .utils import ensure_dir, ordered_slides
 
 
-def export_pdf(run_root: Path, output_path: Path | None = None) -> Path:
+def export_pdf(
+    run_root: Path,
+    output_path: Path | None = None,
+    *,
+    profile: str = "print",
+    jpeg_quality: int | None = None,
+    dpi: float | None = None,
+    page_width: int | None = None,
+    workers: int | None = None,
+    use_cache: bool = True,
+) -> Path:
+    encoding = PROFILES[profile]
+    if jpeg_quality is not None:
+        encoding = replace(encoding, quality=jpeg_quality)
+    if dpi is not None:
+        encoding = replace(encoding, dpi=dpi)
+    if page_width is not None:
+        encoding = replace(encoding, max_width=page_width)
+
     slides = load_slides(run_root).get("slides", [])
     ordered = ordered_slides(slides)
     final_dir = run_root / "final"
@@ -40,6 +62,37 @@ def export_pdf(run_root: Path, output_path: Path | None = None) -> Path:
     else:
         ensure_dir(output_path.parent)
 
-    pdf_bytes = img2pdf.convert([str(path) for path in image_paths])
-    output_path.write_bytes(pdf_bytes)
+    cache_root = run_root / "exports" / ".cache" if use_cache else None
+    # Pages are written one at a time, in order, as they come back from the workers, so
+    # memory stays flat with deck size.
+    tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    with tmp_path.open("wb") as handle:
+        writer = StreamingPdfWriter(handle)
+        for page in _prepare_pages(image_paths, encoding, cache_root, workers or os.cpu_count() or 1):
+            writer.add_page(page)
+        writer.close()
+    os.replace(tmp_path, output_path)
     return output_path
+
+
+def _prepare_pages(
+    image_paths: list[Path],
+    encoding: PageEncoding,
+    cache_root: Path | None,
+    workers: int,
+) -> Iterator[EncodedPage]:
+    if workers <= 1 or len(image_paths) <= 1:
+        for image_path in image_paths:
+            yield prepare_page(image_path, encoding, cache_root)
+        return
+    # A bounded window of in-flight pages, unlike Executor.map, which would submit every
+    # page up front and hold finished ones until the writer catches up.
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future[EncodedPage]] = deque()
+        for image_path in image_paths:
+            pending.append(pool.submit(prepare_page, image_path, encoding, cache_root))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
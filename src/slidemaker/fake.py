@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import io
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+from openai import InternalServerError, RateLimitError
+from PIL import Image
+
+from .imaging import GradingImageOptions, ImagePayload
+from .metrics import CallSpan
+from .openai_client import GradeResult, _is_retryable, _rate_limit_hook
+from .ratelimit import AdaptiveLimiter
+from .utils import BackoffConfig, ensure_dir, load_json, retry_async, save_json
+
+
+FAKE_URL = "https://fake.local/v1"
+
+
+@dataclass
+class FakeOptions:
+    image_latency: float = 2.0
+    grade_latency: float = 0.5
+    # Latencies are drawn uniformly from latency * (1 +/- jitter).
+    latency_jitter: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    pass_probability: float = 0.3
+    precheck_latency: float = 0.2
+    # Share of images a precheck rejects outright. These come out of the failing share,
+    # so enabling the precheck leaves the overall pass rate unchanged.
+    precheck_reject_rate: float = 0.35
+    # Seconds before a fake batch completes.
+    batch_latency: float = 5.0
+    seed: int | None = None
+
+
+def _fake_response(status: int, path: str, headers: dict[str, str] | None = None) -> httpx.Response:
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", f"{FAKE_URL}{path}"))
+
+
+class _FakeBackend:
+    def __init__(
+        self,
+        options: FakeOptions,
+        latency: float,
+        path: str,
+        limiter: AdaptiveLimiter | None = None,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.options = options
+        self.latency = latency
+        self.path = path
+        self.limiter = limiter or AdaptiveLimiter()
+        self.backoff = BackoffConfig()
+        self.rng = rng or random.Random(options.seed)
+
+    async def _call(self, span: CallSpan, latency: float) -> None:
+        span.calls += 1
+        queued = time.perf_counter()
+        async with self.limiter.slot():
+            span.queue_seconds += time.perf_counter() - queued
+            jitter = self.options.latency_jitter
+            with span.timed("network"):
+                await asyncio.sleep(latency * self.rng.uniform(1 - jitter, 1 + jitter))
+        roll = self.rng.random()
+        if roll < self.options.rate_limit_rate:
+            headers = {"retry-after-ms": str(int(self.options.retry_after * 1000))}
+            response = _fake_response(429, self.path, headers)
+            raise RateLimitError("Simulated rate limit", response=response, body=None)
+        if roll < self.options.rate_limit_rate + self.options.error_rate:
+            response = _fake_response(500, self.path)
+            raise InternalServerError("Simulated server error", response=response, body=None)
+        self.limiter.observe_success({})
+
+    async def _run(self, span: CallSpan, latency: float | None = None) -> None:
+        await retry_async(
+            lambda: self._call(span, self.latency if latency is None else latency),
+            _is_retryable,
+            self.backoff,
+            retry_after=_rate_limit_hook(self.limiter),
+            on_retry=span.on_retry,
+        )
+
+
+def _synthetic_png(size: str, cells: bytes) -> bytes:
+    try:
+        width, height = (int(part) for part in size.split("x"))
+    except ValueError:
+        width, height = 1024, 1024
+    # A random 8x8 grid of colored blocks, so every image compresses like a flat slide
+    # yet hashes differently from its siblings.
+    grid = Image.frombytes("RGB", (8, 8), cells)
+    buffer = io.BytesIO()
+    grid.resize((width, height), Image.Resampling.NEAREST).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeImageClient(_FakeBackend):
+    def __init__(
+        self,
+        options: FakeOptions | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rng: random.Random | None = None,
+    ) -> None:
+        options = options or FakeOptions()
+        super().__init__(options, options.image_latency, "/images/generations", limiter, rng)
+
+    async def generate_images(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        size: str,
+        quality: str,
+        background: str,
+        n: int,
+        variant: int = 0,
+        span: CallSpan | None = None,
+    ) -> list[ImagePayload]:
+        span = span or CallSpan("image")
+        span.model = model
+        await self._run(span)
+        return await self._images(size, n, span)
+
+    async def edit_images(
+        self,
+        *,
+        model: str,
+        image_bytes: bytes,
+        prompt: str,
+        size: str,
+        quality: str,
+        background: str,
+        n: int,
+        mask: bytes | None = None,
+        variant: int = 0,
+        span: CallSpan | None = None,
+    ) -> list[ImagePayload]:
+        span = span or CallSpan("edit")
+        span.model = model
+        span.request_bytes = len(image_bytes) + len(mask or b"")
+        await self._run(span)
+        return await self._images(size, n, span)
+
+    async def _images(self, size: str, n: int, span: CallSpan) -> list[ImagePayload]:
+        grids = [self.rng.randbytes(8 * 8 * 3) for _ in range(n)]
+        with span.timed("decode"):
+            images = [await asyncio.to_thread(_synthetic_png, size, cells) for cells in grids]
+        span.response_bytes += sum(len(image) for image in images)
+        return [ImagePayload(image) for image in images]
+
+
+class FakeGrader(_FakeBackend):
+    def __init__(
+        self,
+        options: FakeOptions | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rng: random.Random | None = None,
+    ) -> None:
+        options = options or FakeOptions()
+        super().__init__(options, options.grade_latency, "/responses", limiter, rng)
+        self.image_options = GradingImageOptions()
+        self.screened: set[int] = set()
+
+    async def grade_image(
+        self,
+        *,
+        model: str,
+        rubric: list[str],
+        prompt: str,
+        slide_title: str,
+        image_bytes: bytes,
+        image_b64: str | None = None,
+        span: CallSpan | None = None,
+        precheck: bool = False,
+    ) -> GradeResult:
+        span = span or CallSpan("precheck" if precheck else "grade")
+        span.model = model
+        span.request_bytes = len(image_bytes)
+        start = time.perf_counter()
+        reject_rate = min(self.options.precheck_reject_rate, 1 - self.options.pass_probability)
+        if precheck:
+            await self._run(span, self.options.precheck_latency)
+            passed = self.rng.random() >= reject_rate
+            if passed:
+                self.screened.add(hash(image_bytes))
+            failed = [] if passed else [self.rng.choice(rubric) if rubric else "Simulated hard failure"]
+            return GradeResult(
+                passed=passed,
+                score=1.0 if passed else 0.0,
+                failures=failed,
+                improvements=[],
+                summary="Passed precheck." if passed else f"Rejected by precheck: {'; '.join(failed)}",
+                payload={"seconds": round(time.perf_counter() - start, 4), "fake": True, "tier": "precheck"},
+            )
+        await self._run(span)
+        pass_probability = self.options.pass_probability
+        if hash(image_bytes) in self.screened:
+            self.screened.discard(hash(image_bytes))
+            pass_probability /= 1 - reject_rate
+        passed = self.rng.random() < pass_probability
+        failed: list[str] = []
+        if not passed:
+            failed = [self.rng.choice(rubric) if rubric else "Simulated failure"]
+        return GradeResult(
+            passed=passed,
+            score=self.rng.uniform(0.8, 1.0) if passed else self.rng.uniform(0.2, 0.8),
+            failures=failed,
+            improvements=[f"Fix: {item}" for item in failed],
+            summary="Synthetic grade from the fake backend.",
+            payload={"seconds": round(time.perf_counter() - start, 4), "fake": True},
+        )
+
+
+@dataclass
+class FakeFile:
+    id: str
+    text: str = ""
+
+
+@dataclass
+class FakeBatch:
+    id: str
+    status: str
+    output_file_id: str | None = None
+
+
+class _FakeFiles:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    async def create(self, *, file: Any, purpose: str) -> FakeFile:
+        uploaded = FakeFile(f"file-{uuid.uuid4().hex[:12]}")
+        (self.root / f"{uploaded.id}.jsonl").write_bytes(file.read())
+        return uploaded
+
+    async def content(self, file_id: str) -> FakeFile:
+        return FakeFile(file_id, (self.root / f"{file_id}.jsonl").read_text(encoding="utf-8"))
+
+
+class _FakeBatches:
+    def __init__(self, root: Path, options: FakeOptions, rng: random.Random) -> None:
+        self.root = root
+        self.options = options
+        self.rng = rng
+
+    async def create(self, *, input_file_id: str, endpoint: str, completion_window: str) -> FakeBatch:
+        batch = FakeBatch(f"batch_{uuid.uuid4().hex[:12]}", "validating")
+        record = {
+            "id": batch.id,
+            "status": batch.status,
+            "input_file_id": input_file_id,
+            "endpoint": endpoint,
+            "created_at": time.time(),
+        }
+        save_json(self.root / f"{batch.id}.json", record)
+        return batch
+
+    async def retrieve(self, batch_id: str) -> FakeBatch:
+        path = self.root / f"{batch_id}.json"
+        record = load_json(path, None)
+        if record is None:
+            return FakeBatch(batch_id, "expired")
+        if record["status"] != "completed":
+            if time.time() - record["created_at"] < self.options.batch_latency:
+                record["status"] = "in_progress"
+            else:
+                record["output_file_id"] = await asyncio.to_thread(self._complete, record)
+                record["status"] = "completed"
+            save_json(path, record)
+        return FakeBatch(batch_id, record["status"], record.get("output_file_id"))
+
+    def _complete(self, record: dict[str, Any]) -> str:
+        output_id = f"file-{uuid.uuid4().hex[:12]}"
+        lines = (self.root / f"{record['input_file_id']}.jsonl").read_text(encoding="utf-8").splitlines()
+        with (self.root / f"{output_id}.jsonl").open("w", encoding="utf-8") as handle:
+            for line in lines:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if self.rng.random() < self.options.error_rate:
+                    response = {"status_code": 500, "body": {"error": {"message": "Simulated server error"}}}
+                else:
+                    response = {"status_code": 200, "body": self._body(item["url"], item["body"])}
+                handle.write(json.dumps({"custom_id": item["custom_id"], "response": response}) + "\n")
+        return output_id
+
+    def _body(self, endpoint: str, request: dict[str, Any]) -> dict[str, Any]:
+        if endpoint.endswith("/images/generations"):
+            images = [_synthetic_png(request["size"], self.rng.randbytes(8 * 8 * 3)) for _ in range(request["n"])]
+            return {"data": [{"b64_json": base64.b64encode(image).decode("ascii")} for image in images]}
+        passed = self.rng.random() < self.options.pass_probability
+        failures = [] if passed else ["Simulated failure"]
+        grade = {
+            "pass": passed,
+            "score": self.rng.uniform(0.8, 1.0) if passed else self.rng.uniform(0.2, 0.8),
+            "failures": failures,
+            "improvements": [f"Fix: {item}" for item in failures],
+            "summary": "Synthetic batch grade from the fake backend.",
+        }
+        return {
+            "output": [{"type": "message", "content": [{"type": "output_text", "text": json.dumps(grade)}]}],
+            "usage": {"input_tokens": 1000, "output_tokens": 60},
+        }
+
+
+class FakeBatchClient:
+    # Stands in for the files and batches endpoints of AsyncOpenAI. State lives on disk under
+    # root, so a rerun resumes polling a fake batch just as it would a real one.
+    def __init__(self, root: Path, options: FakeOptions | None = None) -> None:
+        options = options or FakeOptions()
+        ensure_dir(root)
+        self.files = _FakeFiles(root)
+        self.batches = _FakeBatches(root, options, random.Random(options.seed))
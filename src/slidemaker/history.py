@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import html
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TextIO
+
+from .store import load_index
+from .thumbnails import Thumbnail, ensure_thumbnails
+from .utils import ordered_slides
+
+
+# USD per image by quality and size; "auto" quality is priced as high.
+IMAGE_PRICES = {
+    "low": {"1024x1024": 0.011, "1536x1024": 0.016, "1024x1536": 0.016},
+    "medium": {"1024x1024": 0.042, "1536x1024": 0.063, "1024x1536": 0.063},
+    "high": {"1024x1024": 0.167, "1536x1024": 0.25, "1024x1536": 0.25},
+}
+# USD per token for grader calls.
+GRADE_TOKEN_PRICES = {"input": 1.25 / 1_000_000, "output": 10.0 / 1_000_000}
+BATCH_DISCOUNT = 0.5
+HISTORY_THUMB_WIDTHS = (160,)
+
+
+@dataclass
+class Prices:
+    image: float | None = None
+    grade: float | None = None
+
+    def image_cost(self, attempt: dict[str, Any]) -> float | None:
+        if self.image is not None:
+            cost = self.image
+        else:
+            quality = attempt.get("image_quality")
+            if quality is None:
+                return None
+            table = IMAGE_PRICES.get(quality, IMAGE_PRICES["high"])
+            cost = table.get(attempt.get("size") or "1536x1024", max(table.values()))
+        return cost * BATCH_DISCOUNT if attempt.get("batch") else cost
+
+    def grade_cost(self, attempt: dict[str, Any]) -> float | None:
+        if attempt.get("grade_tier") == "local" or "duplicate_of" in attempt or attempt.get("grade_cached"):
+            # Never reached a grader: a prefilter reject, a reused near-duplicate grade or a cache hit.
+            return 0.0
+        if self.grade is not None:
+            cost = self.grade
+        elif "input_tokens" in attempt or "output_tokens" in attempt:
+            cost = (
+                attempt.get("input_tokens", 0) * GRADE_TOKEN_PRICES["input"]
+                + attempt.get("output_tokens", 0) * GRADE_TOKEN_PRICES["output"]
+            )
+        else:
+            return None
+        return cost * BATCH_DISCOUNT if attempt.get("grade_batch") else cost
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+@dataclass
+class SlideStats:
+    attempts: int = 0
+    spend: float = 0.0
+    unpriced: int = 0
+    seconds_to_approval: float | None = None
+
+
+def _slide_stats(attempts: list[dict[str, Any]], approved: bool, prices: Prices) -> SlideStats:
+    stats = SlideStats(attempts=len(attempts))
+    for attempt in attempts:
+        for cost in (prices.image_cost(attempt), prices.grade_cost(attempt)):
+            if cost is None:
+                stats.unpriced += 1
+            else:
+                stats.spend += cost
+    timed = [attempt for attempt in attempts if "started_at" in attempt]
+    if approved and timed:
+        start = min(attempt["started_at"] for attempt in timed)
+        end = max(
+            attempt["started_at"] + attempt.get("generate_seconds", 0.0) + attempt.get("grade_seconds", 0.0)
+            for attempt in timed
+        )
+        stats.seconds_to_approval = end - start
+    return stats
+
+
+def _fmt_seconds(value: float | None) -> str:
+    if value is None:
+        return "n/a"
+    if value >= 120:
+        return f"{value / 60:.1f}m"
+    if value < 10:
+        return f"{value:.2f}s"
+    return f"{value:.1f}s"
+
+
+def _fmt_percentiles(values: list[float]) -> str:
+    return f"{_fmt_seconds(percentile(values, 50))} / {_fmt_seconds(percentile(values, 95))}"
+
+
+def _sparkline(scores: list[float]) -> str:
+    if len(scores) < 2:
+        return ""
+    width, height = 120, 28
+    # Graders have scored on 0-1 and on 0-10; a slide's scores share one scale.
+    scale = 10.0 if max(scores) > 1.0 else 1.0
+    step = width / (len(scores) - 1)
+    points = " ".join(
+        f"{index * step:.1f},{height - max(min(score / scale, 1.0), 0.0) * height:.1f}"
+        for index, score in enumerate(scores)
+    )
+    return (
+        f'<svg class="spark" viewBox="0 0 {width} {height}" width="{width}" height="{height}">'
+        f'<polyline fill="none" stroke="#7a4b2a" stroke-width="1.5" points="{points}"/></svg>'
+    )
+
+
+def build_history(
+    run_root: Path,
+    slides: list[dict[str, Any]],
+    *,
+    prices: Prices | None = None,
+    workers: int | None = None,
+) -> Path:
+    prices = prices or Prices()
+    index = load_index(run_root).get("slides", {})
+    ordered = [slide for slide in ordered_slides(slides) if slide.get("id") in index]
+
+    # First pass keeps only numbers so aggregates can lead the page.
+    per_slide: dict[str, SlideStats] = {}
+    generate_latencies: list[float] = []
+    grade_latencies: list[float] = []
+    for slide in ordered:
+        entry = index[slide["id"]]
+        attempts = entry.get("attempts", [])
+        per_slide[slide["id"]] = _slide_stats(attempts, bool(entry.get("final_image")), prices)
+        generate_latencies.extend(a["generate_seconds"] for a in attempts if "generate_seconds" in a)
+        grade_latencies.extend(a["grade_seconds"] for a in attempts if "grade_seconds" in a)
+
+    image_paths = [
+        run_root / attempt["file"]
+        for slide in ordered
+        for attempt in index[slide["id"]].get("attempts", [])
+        if (run_root / attempt["file"]).exists()
+    ]
+    thumbnails = ensure_thumbnails(run_root, image_paths, widths=HISTORY_THUMB_WIDTHS, workers=workers)
+
+    history_path = run_root / "history.html"
+    tmp_path = history_path.with_name(f".{history_path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        _write_head(handle)
+        _write_summary(handle, ordered, per_slide, generate_latencies, grade_latencies)
+        for slide in ordered:
+            _write_slide(handle, run_root, slide, index[slide["id"]], per_slide[slide["id"]], thumbnails)
+        handle.write("</body>\n</html>\n")
+    tmp_path.replace(history_path)
+    return history_path
+
+
+def _write_head(handle: TextIO) -> None:
+    handle.write(
+        """<!doctype html>
+<html lang="en">
+<head>
+  <meta charset="utf-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1" />
+  <title>SlideMaker History</title>
+  <style>
+    body { font-family: "Georgia", serif; margin: 24px; background: #f4f1ec; color: #222; }
+    h1 { font-size: 28px; margin-bottom: 16px; }
+    table { border-collapse: collapse; background: #fff; margin-bottom: 24px; }
+    th, td { border: 1px solid #ddd; padding: 6px 10px; text-align: left; font-size: 14px; }
+    section { background: #fff; border: 1px solid #ddd; padding: 12px; margin-bottom: 18px; }
+    section h2 { font-size: 18px; margin: 0 0 6px; }
+    .meta { font-size: 13px; color: #555; margin-bottom: 8px; }
+    .strip { display: flex; gap: 10px; overflow-x: auto; padding-bottom: 6px; }
+    figure { margin: 0; flex: 0 0 160px; font-size: 12px; }
+    figure img { width: 160px; height: auto; display: block; border: 3px solid #c44; }
+    figure.pass img { border-color: #3a7; }
+    figure ul { margin: 4px 0 0; padding-left: 16px; color: #633; }
+  </style>
+</head>
+<body>
+  <h1>SlideMaker History</h1>
+"""
+    )
+
+
+def _write_summary(
+    handle: TextIO,
+    ordered: list[dict[str, Any]],
+    per_slide: dict[str, SlideStats],
+    generate_latencies: list[float],
+    grade_latencies: list[float],
+) -> None:
+    total_attempts = sum(stats.attempts for stats in per_slide.values())
+    total_spend = sum(stats.spend for stats in per_slide.values())
+    unpriced = sum(stats.unpriced for stats in per_slide.values())
+    approvals = [
+        stats.seconds_to_approval for stats in per_slide.values() if stats.seconds_to_approval is not None
+    ]
+    rows = [
+        ("Slides", str(len(ordered))),
+        ("Attempts", str(total_attempts)),
+        ("Attempts per slide", f"{total_attempts / len(ordered):.2f}" if ordered else "n/a"),
+        ("Time to approval p50 / p95", _fmt_percentiles(approvals)),
+        ("Generate latency p50 / p95", _fmt_percentiles(generate_latencies)),
+        ("Grade latency p50 / p95", _fmt_percentiles(grade_latencies)),
+        ("Estimated spend", f"${total_spend:.2f}" + (f" ({unpriced} calls unpriced)" if unpriced else "")),
+    ]
+    handle.write("  <table>\n")
+    for label, value in rows:
+        handle.write(f"    <tr><th>{label}</th><td>{value}</td></tr>\n")
+    handle.write("  </table>\n")
+
+    costly = sorted(
+        ordered,
+        key=lambda slide: (per_slide[slide["id"]].spend, per_slide[slide["id"]].attempts),
+        reverse=True,
+    )
+    handle.write(
+        "  <table>\n    <tr><th>Most expensive slides</th><th>Attempts</th>"
+        "<th>Spend</th><th>Time to approval</th></tr>\n"
+    )
+    for slide in costly[:10]:
+        stats = per_slide[slide["id"]]
+        handle.write(
+            f'    <tr><td><a href="#{html.escape(slide["id"])}">{html.escape(slide["id"])}</a></td>'
+            f"<td>{stats.attempts}</td><td>${stats.spend:.2f}</td>"
+            f"<td>{_fmt_seconds(stats.seconds_to_approval)}</td></tr>\n"
+        )
+    handle.write("  </table>\n")
+
+
+def _write_slide(
+    handle: TextIO,
+    run_root: Path,
+    slide: dict[str, Any],
+    entry: dict[str, Any],
+    stats: SlideStats,
+    thumbnails: dict[Path, Thumbnail],
+) -> None:
+    slide_id = slide["id"]
+    attempts = entry.get("attempts", [])
+    status = "approved" if entry.get("final_image") else slide.get("status", "pending")
+    handle.write(f'  <section id="{html.escape(slide_id)}">\n')
+    handle.write(f"    <h2>{html.escape(slide_id)} - {html.escape(str(slide.get('title', slide_id)))}</h2>\n")
+    handle.write(
+        f'    <div class="meta">{status} &middot; {stats.attempts} attempts &middot; ${stats.spend:.2f} '
+        f"&middot; {_fmt_seconds(stats.seconds_to_approval)} to approval "
+        f"{_sparkline([attempt.get('score', 0.0) for attempt in attempts])}</div>\n"
+    )
+    handle.write('    <div class="strip">\n')
+    for number, attempt in enumerate(attempts, start=1):
+        thumb = thumbnails.get(run_root / attempt["file"])
+        css = "pass" if attempt.get("pass") else "fail"
+        image = (
+            f'<a href="{html.escape(attempt["file"])}"><img src="{thumb.src}" width="{thumb.width}" '
+            f'height="{thumb.height}" loading="lazy" decoding="async" alt="attempt {number}"/></a>'
+            if thumb
+            else ""
+        )
+        failures = "".join(f"<li>{html.escape(str(failure))}</li>" for failure in attempt.get("failures", []))
+        handle.write(
+            f'      <figure class="{css}" title="{html.escape(str(attempt.get("summary", "")))}">{image}'
+            f"<figcaption>#{number} score {attempt.get('score', 0.0):.2f}</figcaption>"
+            f"{f'<ul>{failures}</ul>' if failures else ''}</figure>\n"
+        )
+    handle.write("    </div>\n  </section>\n")
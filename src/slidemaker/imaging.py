@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import io
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+FORMAT_MIME = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass
+class GradingImageOptions:
+    max_width: int = 0
+    format: str = "png"
+    quality: int = 85
+    detail: str = "auto"
+
+    @property
+    def passthrough(self) -> bool:
+        return self.max_width <= 0 and self.format == "png"
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    seconds: float
+    b64: str | None = None
+
+
+@dataclass
+class ImagePayload:
+    data: bytes
+    # The base64 text the API returned, kept only when a passthrough grade can send it as-is.
+    b64: str | None = None
+
+
+def png_size(image_bytes: bytes) -> tuple[int, int]:
+    if image_bytes[:8] != PNG_SIGNATURE or len(image_bytes) < 24:
+        return (0, 0)
+    return (int.from_bytes(image_bytes[16:20], "big"), int.from_bytes(image_bytes[20:24], "big"))
+
+
+def dhash(image_bytes: bytes, size: int = 16) -> str:
+    # Difference hash: one bit per horizontally adjacent pair of a size+1 x size grayscale
+    # thumbnail. Near-identical images land within a few bits of each other.
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = image.convert("L").resize((size + 1, size), Image.Resampling.BOX).tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            bits = (bits << 1) | (pixels[offset + column] < pixels[offset + column + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hash_distance(left: str, right: str) -> int:
+    return (int(left, 16) ^ int(right, 16)).bit_count()
+
+
+def flatten_alpha(image: Image.Image, background: tuple[int, int, int] = (255, 255, 255)) -> Image.Image:
+    if image.mode in {"RGBA", "LA"} or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        canvas = Image.new("RGB", rgba.size, background)
+        canvas.paste(rgba, mask=rgba.getchannel("A"))
+        return canvas
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def encode_for_grading(
+    image_bytes: bytes,
+    options: GradingImageOptions,
+    b64: str | None = None,
+) -> EncodedImage:
+    start = time.perf_counter()
+    if options.passthrough:
+        width, height = png_size(image_bytes)
+        return EncodedImage(image_bytes, FORMAT_MIME["png"], width, height, time.perf_counter() - start, b64)
+
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        image = source.copy()
+    if options.max_width > 0 and image.width > options.max_width:
+        height = max(round(image.height * options.max_width / image.width), 1)
+        image = image.resize((options.max_width, height), Image.LANCZOS)
+    if options.format == "jpeg":
+        image = flatten_alpha(image)
+
+    buffer = io.BytesIO()
+    save_kwargs: dict[str, object] = {}
+    if options.format in {"jpeg", "webp"}:
+        save_kwargs["quality"] = options.quality
+    if options.format == "png":
+        save_kwargs["optimize"] = True
+    image.save(buffer, format=options.format.upper(), **save_kwargs)
+    return EncodedImage(
+        data=buffer.getvalue(),
+        mime=FORMAT_MIME[options.format],
+        width=image.width,
+        height=image.height,
+        seconds=time.perf_counter() - start,
+    )
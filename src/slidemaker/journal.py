@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+
+JOURNAL_NAME = "journal.jsonl"
+
+
+def journal_path(run_root: Path) -> Path:
+    return run_root / JOURNAL_NAME
+
+
+def read_journal(run_root: Path, after_seq: int = 0) -> Iterator[dict[str, Any]]:
+    path = journal_path(run_root)
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # A line torn by a crash mid-write; the events around it are intact.
+                continue
+            if event.get("seq", 0) > after_seq:
+                yield event
+
+
+def apply_index_event(index: dict[str, Any], event: dict[str, Any]) -> None:
+    kind = event.get("type")
+    if kind not in {"attempt", "final"}:
+        return
+    entry = index.setdefault("slides", {}).setdefault(
+        event["slide_id"],
+        {"title": event.get("title"), "final_image": None, "attempts": []},
+    )
+    if kind == "attempt":
+        entry["attempts"].append(event["attempt"])
+    else:
+        entry["final_image"] = event["final_image"]
+        if "approved_at" in event:
+            entry["approved_at"] = event["approved_at"]
+
+
+def apply_slides_event(slides: dict[str, Any], event: dict[str, Any]) -> None:
+    if event.get("type") != "status":
+        return
+    for slide in slides.get("slides", []):
+        if slide.get("id") == event["slide_id"]:
+            slide["status"] = event["status"]
+
+
+def _ends_with_newline(path: Path) -> bool:
+    # A crash mid-write can leave a torn last line; only the final byte matters.
+    with path.open("rb") as handle:
+        handle.seek(-1, os.SEEK_END)
+        return handle.read(1) == b"\n"
+
+
+class RunJournal:
+    def __init__(self, run_root: Path, seq: int = 0) -> None:
+        self.path = journal_path(run_root)
+        self.seq = seq
+        self.handle: TextIO | None = None
+
+    def append(self, event: dict[str, Any]) -> int:
+        if self.handle is None:
+            self.handle = self.path.open("a", encoding="utf-8")
+            if self.handle.tell() > 0 and not _ends_with_newline(self.path):
+                self.handle.write("\n")
+        self.seq += 1
+        record = {"seq": self.seq, **event}
+        self.handle.write(json.dumps(record, ensure_ascii=True) + "\n")
+        self.handle.flush()
+        return self.seq
+
+    def truncate(self) -> None:
+        self.close()
+        self.path.write_text("", encoding="utf-8")
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
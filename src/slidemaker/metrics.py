@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+
+METRICS_NAME = "metrics.jsonl"
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+PHASES = ("schedule", "queue", "network", "backoff", "encode", "decode", "write", "total")
+
+
+@dataclass
+class CallSpan:
+    op: str
+    model: str = ""
+    started_at: float = field(default_factory=time.time)
+    # schedule: waiting in the stage queue; queue: waiting on the limiter slot.
+    schedule_seconds: float = 0.0
+    queue_seconds: float = 0.0
+    network_seconds: float = 0.0
+    backoff_seconds: float = 0.0
+    encode_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    write_seconds: float = 0.0
+    total_seconds: float = 0.0
+    calls: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached: bool = False
+    status: str = "ok"
+
+    @contextmanager
+    def timed(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            name = f"{phase}_seconds"
+            setattr(self, name, getattr(self, name) + time.perf_counter() - start)
+
+    def on_retry(self, exc: Exception, delay: float) -> None:
+        self.retries += 1
+        self.backoff_seconds += delay
+        if getattr(exc, "status_code", None) == 429:
+            self.rate_limited += 1
+
+    def finish(self, status: str = "ok") -> None:
+        self.status = status
+        self.total_seconds = time.time() - self.started_at
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            key: round(value, 4) if isinstance(value, float) else value
+            for key, value in asdict(self).items()
+        }
+
+
+class MetricsLog:
+    def __init__(self, run_root: Path) -> None:
+        self.path = run_root / METRICS_NAME
+        self.handle: TextIO | None = None
+
+    def append(self, record: dict[str, Any]) -> None:
+        if self.handle is None:
+            self.handle = self.path.open("a", encoding="utf-8")
+        self.handle.write(json.dumps(record, ensure_ascii=True) + "\n")
+        self.handle.flush()
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def read_metrics(run_root: Path) -> Iterator[dict[str, Any]]:
+    path = run_root / METRICS_NAME
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+@dataclass
+class _Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    total: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def render_metrics(records: Iterator[dict[str, Any]], openmetrics: bool = False) -> str:
+    counters: dict[str, dict[str, float]] = {
+        "calls": {},
+        "retries": {},
+        "rate_limited": {},
+        "request_bytes": {},
+        "response_bytes": {},
+        "input_tokens": {},
+        "output_tokens": {},
+    }
+    histograms: dict[str, _Histogram] = {}
+    for record in records:
+        op = record.get("op", "")
+        labels = _labels(op=op, model=record.get("model", ""))
+        status_labels = _labels(op=op, model=record.get("model", ""), status=record.get("status", "ok"))
+        counters["calls"][status_labels] = counters["calls"].get(status_labels, 0) + 1
+        for name in ("retries", "rate_limited", "request_bytes", "response_bytes", "input_tokens", "output_tokens"):
+            counters[name][labels] = counters[name].get(labels, 0) + record.get(name, 0)
+        for phase in PHASES:
+            value = record.get(f"{phase}_seconds")
+            if value:
+                key = _labels(op=op, phase=phase)
+                histograms.setdefault(key, _Histogram()).observe(value)
+
+    lines: list[str] = []
+    # OpenMetrics names the counter family without the _total suffix its samples carry.
+    for name, samples in counters.items():
+        family = f"slidemaker_{name}"
+        lines.append(f"# TYPE {family if openmetrics else family + '_total'} counter")
+        for labels, value in sorted(samples.items()):
+            lines.append(f"{family}_total{{{labels}}} {value:g}")
+    family = "slidemaker_call_phase_seconds"
+    lines.append(f"# TYPE {family} histogram")
+    if openmetrics:
+        lines.append(f"# UNIT {family} seconds")
+    for labels, histogram in sorted(histograms.items()):
+        for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+            lines.append(f'{family}_bucket{{{labels},le="{bound:g}"}} {count}')
+        lines.append(f'{family}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{family}_sum{{{labels}}} {histogram.total:.6f}")
+        lines.append(f"{family}_count{{{labels}}} {histogram.count}")
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
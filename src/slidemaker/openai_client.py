@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+import importlib.util
 import json
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass, field
 from typing import Any
 
-from openai import AsyncOpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from openai import APIConnectionError, APIError, APITimeoutError, RateLimitError
 
+from .cache import ResponseCache, cache_key, content_hash
+from .imaging import EncodedImage, GradingImageOptions, ImagePayload, encode_for_grading
+from .metrics import CallSpan
+from .ratelimit import AdaptiveLimiter
 from .utils import BackoffConfig, retry_async
 
 
@@ -22,6 +30,42 @@ class GradeResult:
     failures: list[str]
     improvements: list[str]
     summary: str
+    payload: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ClientOptions:
+    pool_size: int = 32
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    image_timeout: float = 300.0
+    grade_timeout: float = 120.0
+    http2: bool | None = None
+
+
+def create_client(
+    options: ClientOptions | None = None,
+    api_key: str | None = None,
+    base_url: str | None = None,
+) -> AsyncOpenAI:
+    options = options or ClientOptions()
+    http2 = options.http2
+    if http2 is None:
+        http2 = importlib.util.find_spec("h2") is not None
+    http_client = DefaultAsyncHttpxClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=options.pool_size,
+            max_keepalive_connections=options.pool_size,
+            keepalive_expiry=options.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            max(options.image_timeout, options.grade_timeout),
+            connect=options.connect_timeout,
+        ),
+    )
+    # Retries are handled by retry_async so the limiter sees every 429.
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
 
 
 def _is_retryable(exc: Exception) -> bool:
@@ -35,27 +79,79 @@ def _is_retryable(exc: Exception) -> bool:
     return False
 
 
-def _extract_base64(result: Any) -> str:
+def _error_headers(exc: Exception) -> Any:
+    response = getattr(exc, "response", None)
+    return getattr(response, "headers", None)
+
+
+def _rate_limit_hook(limiter: AdaptiveLimiter) -> Any:
+    def _retry_after(exc: Exception) -> float | None:
+        status = getattr(exc, "status_code", None)
+        if isinstance(exc, RateLimitError) or status == 429:
+            return limiter.observe_rate_limit(_error_headers(exc))
+        return None
+
+    return _retry_after
+
+
+def build_image_request(
+    *,
+    model: str,
+    prompt: str,
+    size: str,
+    quality: str,
+    background: str,
+    n: int,
+) -> dict[str, Any]:
+    return {
+        "model": model,
+        "prompt": prompt,
+        "size": size,
+        "quality": quality,
+        "background": background,
+        "n": n,
+    }
+
+
+def decode_images(result: Any) -> list[ImagePayload]:
+    return [ImagePayload(base64.b64decode(item), item) for item in _extract_base64(result)]
+
+
+def _extract_base64(result: Any) -> list[str]:
     data = getattr(result, "data", None)
     if data and len(data) > 0:
-        item = data[0]
-        base64_data = getattr(item, "b64_json", None)
-        if base64_data:
-            return base64_data
+        items = [getattr(item, "b64_json", None) for item in data]
+        if all(items):
+            return items
     if hasattr(result, "model_dump"):
         payload = result.model_dump()
     else:
         payload = result
     try:
-        return payload["data"][0]["b64_json"]
+        items = [item["b64_json"] for item in payload["data"]]
     except Exception as exc:  # noqa: BLE001
         raise RuntimeError("Image API response missing base64 data") from exc
+    if not items or not all(items):
+        raise RuntimeError("Image API response missing base64 data")
+    return items
 
 
 class OpenAIImageClient:
-    def __init__(self, api_key: str | None = None, base_url: str | None = None) -> None:
-        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        cache: ResponseCache | None = None,
+        client: AsyncOpenAI | None = None,
+        options: ClientOptions | None = None,
+    ) -> None:
+        options = options or ClientOptions()
+        self.client = client or create_client(options, api_key=api_key, base_url=base_url)
+        self.timeout = httpx.Timeout(options.image_timeout, connect=options.connect_timeout)
         self.backoff = BackoffConfig()
+        self.limiter = limiter or AdaptiveLimiter()
+        self.cache = cache
 
     async def generate_image(
         self,
@@ -66,24 +162,365 @@ class OpenAIImageClient:
         quality: str,
         background: str,
     ) -> bytes:
-        async def _call() -> bytes:
-            result = await self.client.images.generate(
+        images = await self.generate_images(
+            model=model,
+            prompt=prompt,
+            size=size,
+            quality=quality,
+            background=background,
+            n=1,
+        )
+        return images[0].data
+
+    async def generate_images(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        size: str,
+        quality: str,
+        background: str,
+        n: int,
+        variant: int = 0,
+        span: CallSpan | None = None,
+    ) -> list[ImagePayload]:
+        span = span or CallSpan("image")
+        span.model = model
+        # variant distinguishes repeat requests for the same prompt (e.g. the attempt
+        # number) so a cached failure is not served back on every retry.
+        keys = [
+            cache_key(
+                "image",
                 model=model,
                 prompt=prompt,
                 size=size,
                 quality=quality,
                 background=background,
+                variant=variant + offset,
             )
-            base64_data = _extract_base64(result)
-            return base64.b64decode(base64_data)
+            for offset in range(n)
+        ]
+        request = build_image_request(
+            model=model,
+            prompt=prompt,
+            size=size,
+            quality=quality,
+            background=background,
+            n=n,
+        )
+        span.request_bytes = len(json.dumps(request).encode("utf-8"))
+        return await self._request(
+            keys,
+            span,
+            lambda: self.client.images.with_raw_response.generate(**request, timeout=self.timeout),
+        )
 
-        return await retry_async(_call, _is_retryable, self.backoff)
+    async def edit_images(
+        self,
+        *,
+        model: str,
+        image_bytes: bytes,
+        prompt: str,
+        size: str,
+        quality: str,
+        background: str,
+        n: int,
+        mask: bytes | None = None,
+        variant: int = 0,
+        span: CallSpan | None = None,
+    ) -> list[ImagePayload]:
+        span = span or CallSpan("edit")
+        span.model = model
+        keys = [
+            cache_key(
+                "image_edit",
+                model=model,
+                image=content_hash(image_bytes),
+                mask=content_hash(mask) if mask else None,
+                prompt=prompt,
+                size=size,
+                quality=quality,
+                background=background,
+                variant=variant + offset,
+            )
+            for offset in range(n)
+        ]
+        request: dict[str, Any] = {
+            **build_image_request(
+                model=model,
+                prompt=prompt,
+                size=size,
+                quality=quality,
+                background=background,
+                n=n,
+            ),
+            "image": ("image.png", image_bytes, "image/png"),
+            # Keep the parts of the image the grader did not complain about.
+            "input_fidelity": "high",
+        }
+        if mask:
+            request["mask"] = ("mask.png", mask, "image/png")
+        span.request_bytes = len(image_bytes) + len(mask or b"") + len(prompt.encode("utf-8"))
+        return await self._request(
+            keys,
+            span,
+            lambda: self.client.images.with_raw_response.edit(**request, timeout=self.timeout),
+        )
+
+    async def _request(self, keys: list[str], span: CallSpan, send: Any) -> list[ImagePayload]:
+        if self.cache is not None:
+            cached = [self.cache.get(key) for key in keys]
+            if all(item is not None for item in cached):
+                span.cached = True
+                return [ImagePayload(item) for item in cached]
+
+        async def _call() -> list[ImagePayload]:
+            span.calls += 1
+            queued = time.perf_counter()
+            async with self.limiter.slot():
+                span.queue_seconds += time.perf_counter() - queued
+                with span.timed("network"):
+                    raw = await send()
+            self.limiter.observe_success(raw.headers)
+            with span.timed("decode"):
+                response = raw.parse()
+                images = decode_images(response)
+            span.response_bytes += len(raw.content)
+            usage = usage_stats(getattr(response, "usage", None))
+            span.input_tokens += usage.get("input_tokens", 0)
+            span.output_tokens += usage.get("output_tokens", 0)
+            return images
+
+        images = await retry_async(
+            _call,
+            _is_retryable,
+            self.backoff,
+            retry_after=_rate_limit_hook(self.limiter),
+            on_retry=span.on_retry,
+        )
+        if self.cache is not None:
+            for key, image in zip(keys, images):
+                self.cache.put(key, image.data)
+        return images
+
+
+GRADE_INSTRUCTIONS = (
+    "You are a strict visual grader. Evaluate the image against every rubric item. "
+    "Return JSON only and follow the schema."
+)
+
+GRADE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pass": {"type": "boolean"},
+        "score": {"type": "number"},
+        "failures": {"type": "array", "items": {"type": "string"}},
+        "improvements": {"type": "array", "items": {"type": "string"}},
+        "summary": {"type": "string"},
+    },
+    "required": ["pass", "score", "failures", "improvements", "summary"],
+    "additionalProperties": False,
+}
+
+
+PRECHECK_INSTRUCTIONS = (
+    "You are a fast visual screener. Check the image only against the hard constraints listed. "
+    "Fail it if any constraint is clearly violated. Return JSON only and follow the schema."
+)
+
+PRECHECK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pass": {"type": "boolean"},
+        "failures": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["pass", "failures"],
+    "additionalProperties": False,
+}
+
+
+def build_grade_request(
+    *,
+    model: str,
+    rubric: list[str],
+    prompt: str,
+    slide_title: str,
+    encoded: EncodedImage,
+    detail: str,
+    precheck: bool = False,
+) -> dict[str, Any]:
+    rubric_text = "\n".join(f"- {item}" for item in rubric)
+    image = {
+        "type": "input_image",
+        "image_url": f"data:{encoded.mime};base64,{encoded.b64 or base64.b64encode(encoded.data).decode('ascii')}",
+        "detail": detail,
+    }
+    if precheck:
+        return {
+            "model": model,
+            "instructions": PRECHECK_INSTRUCTIONS,
+            "input": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": f"Hard constraints:\n{rubric_text}"},
+                        image,
+                    ],
+                }
+            ],
+            "text": {
+                "format": {
+                    "type": "json_schema",
+                    "name": "slide_precheck",
+                    "schema": PRECHECK_SCHEMA,
+                    "strict": True,
+                }
+            },
+            "max_output_tokens": 100,
+        }
+    content = [
+        {
+            "type": "input_text",
+            "text": (
+                "Slide title: "
+                f"{slide_title}\n\n"
+                "Prompt used: "
+                f"{prompt}\n\n"
+                "Rubric:\n"
+                f"{rubric_text}\n\n"
+                "Output a pass/fail plus specific failures and improvements."
+            ),
+        },
+        image,
+    ]
+    return {
+        "model": model,
+        "instructions": GRADE_INSTRUCTIONS,
+        "input": [{"role": "user", "content": content}],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "slide_grade",
+                "schema": GRADE_SCHEMA,
+                "strict": True,
+            }
+        },
+        "max_output_tokens": 300,
+    }
+
+
+def payload_stats(encoded: EncodedImage, image_bytes: bytes, detail: str) -> dict[str, Any]:
+    return {
+        "format": encoded.mime,
+        "width": encoded.width,
+        "height": encoded.height,
+        "bytes": len(encoded.data),
+        "original_bytes": len(image_bytes),
+        "encode_seconds": round(encoded.seconds, 4),
+        "detail": detail,
+    }
+
+
+def usage_stats(usage: Any) -> dict[str, Any]:
+    if usage is None:
+        return {}
+    stats = {}
+    for key in ("input_tokens", "output_tokens"):
+        value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+        if value is not None:
+            stats[key] = value
+    return stats
+
+
+def parse_grade(
+    text: str | None,
+    payload: dict[str, Any] | None = None,
+    precheck: bool = False,
+) -> GradeResult:
+    try:
+        data = json.loads(text or "")
+    except json.JSONDecodeError:
+        text = text or ""
+        start = text.find("{")
+        end = text.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            try:
+                data = json.loads(text[start : end + 1])
+            except json.JSONDecodeError as exc:
+                raise RetryableParseError("Failed to parse grader JSON") from exc
+        else:
+            raise RetryableParseError("Grader output missing JSON object")
+    if precheck:
+        failures = list(data["failures"])
+        # Survivors are re-graded in full, so only a rejection's score and summary are kept.
+        return GradeResult(
+            passed=data["pass"],
+            score=1.0 if data["pass"] else 0.0,
+            failures=failures,
+            improvements=[],
+            summary="Passed precheck." if data["pass"] else f"Rejected by precheck: {'; '.join(failures)}",
+            payload={**(payload or {}), "tier": "precheck"},
+        )
+    return GradeResult(
+        passed=data["pass"],
+        score=float(data["score"]),
+        failures=list(data["failures"]),
+        improvements=list(data["improvements"]),
+        summary=str(data["summary"]),
+        payload=payload or {},
+    )
+
+
+def response_output_text(body: dict[str, Any]) -> str:
+    parts = []
+    for item in body.get("output") or []:
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text", ""))
+    return "".join(parts)
 
 
 class OpenAIGrader:
-    def __init__(self, api_key: str | None = None, base_url: str | None = None) -> None:
-        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        cache: ResponseCache | None = None,
+        image_options: GradingImageOptions | None = None,
+        client: AsyncOpenAI | None = None,
+        options: ClientOptions | None = None,
+        precheck_options: GradingImageOptions | None = None,
+    ) -> None:
+        options = options or ClientOptions()
+        self.client = client or create_client(options, api_key=api_key, base_url=base_url)
+        self.timeout = httpx.Timeout(options.grade_timeout, connect=options.connect_timeout)
         self.backoff = BackoffConfig()
+        self.limiter = limiter or AdaptiveLimiter()
+        self.cache = cache
+        self.image_options = image_options or GradingImageOptions()
+        # A low-detail request is billed as one tile, so there is no point uploading more.
+        self.precheck_options = precheck_options or GradingImageOptions(max_width=512, format="jpeg", detail="low")
+
+    def cache_key(
+        self,
+        *,
+        model: str,
+        rubric: list[str],
+        prompt: str,
+        slide_title: str,
+        image_bytes: bytes,
+        precheck: bool = False,
+    ) -> str:
+        return cache_key(
+            "precheck" if precheck else "grade",
+            model=model,
+            rubric=rubric,
+            prompt=prompt,
+            slide_title=slide_title,
+            image=content_hash(image_bytes),
+            image_options=asdict(self.precheck_options if precheck else self.image_options),
+        )
 
     async def grade_image(
         self,
@@ -93,76 +530,71 @@ class OpenAIGrader:
         prompt: str,
         slide_title: str,
         image_bytes: bytes,
+        image_b64: str | None = None,
+        span: CallSpan | None = None,
+        precheck: bool = False,
     ) -> GradeResult:
-        rubric_text = "\n".join(f"- {item}" for item in rubric)
-        instructions = (
-            "You are a strict visual grader. Evaluate the image against every rubric item. "
-            "Return JSON only and follow the schema."
+        span = span or CallSpan("precheck" if precheck else "grade")
+        span.model = model
+        image_options = self.precheck_options if precheck else self.image_options
+        key = self.cache_key(
+            model=model,
+            rubric=rubric,
+            prompt=prompt,
+            slide_title=slide_title,
+            image_bytes=image_bytes,
+            precheck=precheck,
         )
-        content = [
-            {
-                "type": "input_text",
-                "text": (
-                    "Slide title: "
-                    f"{slide_title}\n\n"
-                    "Prompt used: "
-                    f"{prompt}\n\n"
-                    "Rubric:\n"
-                    f"{rubric_text}\n\n"
-                    "Output a pass/fail plus specific failures and improvements."
-                ),
-            },
-            {
-                "type": "input_image",
-                "image_url": f"data:image/png;base64,{base64.b64encode(image_bytes).decode('ascii')}",
-            },
-        ]
+        if self.cache is not None:
+            cached = self.cache.get_json(key)
+            if cached is not None:
+                result = GradeResult(**cached)
+                result.payload = {**result.payload, "seconds": 0.0, "cached": True}
+                span.cached = True
+                return result
+        start = time.perf_counter()
+
+        # Resizing and re-encoding is CPU-bound; keep it off the event loop.
+        encoded = await asyncio.to_thread(encode_for_grading, image_bytes, image_options, image_b64)
+        span.encode_seconds = encoded.seconds
+        span.request_bytes = len(encoded.data)
+        stats = payload_stats(encoded, image_bytes, image_options.detail)
+        request = build_grade_request(
+            model=model,
+            rubric=rubric,
+            prompt=prompt,
+            slide_title=slide_title,
+            encoded=encoded,
+            detail=image_options.detail,
+            precheck=precheck,
+        )
+        # The data URL in the request is now the only base64 copy that is still needed.
+        del encoded, image_b64
 
         async def _call() -> GradeResult:
-            response = await self.client.responses.create(
-                model=model,
-                instructions=instructions,
-                input=[{"role": "user", "content": content}],
-                text={
-                    "format": {
-                        "type": "json_schema",
-                        "name": "slide_grade",
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "pass": {"type": "boolean"},
-                                "score": {"type": "number"},
-                                "failures": {"type": "array", "items": {"type": "string"}},
-                                "improvements": {"type": "array", "items": {"type": "string"}},
-                                "summary": {"type": "string"},
-                            },
-                            "required": ["pass", "score", "failures", "improvements", "summary"],
-                            "additionalProperties": False,
-                        },
-                        "strict": True,
-                    }
-                },
-                max_output_tokens=300,
-            )
-            try:
-                payload = json.loads(response.output_text)
-            except json.JSONDecodeError:
-                text = response.output_text or ""
-                start = text.find("{")
-                end = text.rfind("}")
-                if start != -1 and end != -1 and end > start:
-                    try:
-                        payload = json.loads(text[start : end + 1])
-                    except json.JSONDecodeError as exc:
-                        raise RetryableParseError("Failed to parse grader JSON") from exc
-                else:
-                    raise RetryableParseError("Grader output missing JSON object")
-            return GradeResult(
-                passed=payload["pass"],
-                score=float(payload["score"]),
-                failures=list(payload["failures"]),
-                improvements=list(payload["improvements"]),
-                summary=str(payload["summary"]),
-            )
+            span.calls += 1
+            queued = time.perf_counter()
+            async with self.limiter.slot():
+                span.queue_seconds += time.perf_counter() - queued
+                with span.timed("network"):
+                    raw = await self.client.responses.with_raw_response.create(**request, timeout=self.timeout)
+            self.limiter.observe_success(raw.headers)
+            span.response_bytes += len(raw.content)
+            with span.timed("decode"):
+                response = raw.parse()
+                usage = usage_stats(response.usage)
+                span.input_tokens += usage.get("input_tokens", 0)
+                span.output_tokens += usage.get("output_tokens", 0)
+                return parse_grade(response.output_text, {**stats, **usage}, precheck=precheck)
 
-        return await retry_async(_call, _is_retryable, self.backoff)
+        result = await retry_async(
+            _call,
+            _is_retryable,
+            self.backoff,
+            retry_after=_rate_limit_hook(self.limiter),
+            on_retry=span.on_retry,
+        )
+        result.payload["seconds"] = round(time.perf_counter() - start, 4)
+        if self.cache is not None:
+            self.cache.put_json(key, asdict(result))
+        return result
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import io
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from PIL import Image
+
+from .cache import ResponseCache, cache_key, content_hash
+from .imaging import PNG_SIGNATURE, flatten_alpha, png_size
+
+
+@dataclass
+class PageEncoding:
+    format: str = "flate"
+    quality: int = 85
+    dpi: float = 96.0
+    max_width: int = 0
+
+
+PROFILES = {
+    "print": PageEncoding(format="flate", dpi=96.0),
+    "share": PageEncoding(format="jpeg", quality=75, dpi=96.0, max_width=1280),
+}
+
+
+@dataclass
+class EncodedPage:
+    data: bytes
+    width: int
+    height: int
+    filter: str
+    dpi: float
+    # /DecodeParms for Flate data that still carries PNG row filters.
+    decode_parms: str = ""
+
+
+def png_idat(image_bytes: bytes) -> tuple[bytes, bool]:
+    # Returns the concatenated IDAT stream and whether it can go into a PDF unchanged:
+    # 8-bit RGB, not interlaced. Its zlib data and per-row PNG filters match Flate with
+    # /Predictor 15, which is how img2pdf embeds PNGs without decoding them.
+    if image_bytes[:8] != PNG_SIGNATURE:
+        return b"", False
+    bit_depth, color_type, interlace = image_bytes[24], image_bytes[25], image_bytes[28]
+    chunks = []
+    offset = 8
+    while offset + 8 <= len(image_bytes):
+        length = int.from_bytes(image_bytes[offset : offset + 4], "big")
+        kind = image_bytes[offset + 4 : offset + 8]
+        if kind == b"IDAT":
+            chunks.append(image_bytes[offset + 8 : offset + 8 + length])
+        elif kind == b"IEND":
+            break
+        offset += length + 12
+    return b"".join(chunks), bit_depth == 8 and color_type == 2 and interlace == 0
+
+
+def encode_page(image_bytes: bytes, encoding: PageEncoding) -> EncodedPage:
+    width, height = png_size(image_bytes)
+    if encoding.format == "flate" and (encoding.max_width <= 0 or width <= encoding.max_width):
+        data, passthrough = png_idat(image_bytes)
+        if passthrough:
+            return EncodedPage(data, width, height, "FlateDecode", encoding.dpi, _predictor(width))
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source_width = source.width
+        image = flatten_alpha(source)
+        image.load()
+    if encoding.max_width > 0 and image.width > encoding.max_width:
+        height = max(round(image.height * encoding.max_width / image.width), 1)
+        image = image.resize((encoding.max_width, height), Image.LANCZOS)
+    width, height = image.size
+    # Resizing shrinks the pixel grid, not the page: keep the physical size of the source.
+    dpi = encoding.dpi * width / source_width
+    if encoding.format == "jpeg":
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=encoding.quality, optimize=True)
+        return EncodedPage(buffer.getvalue(), width, height, "DCTDecode", dpi)
+    # Anything else (alpha, palette, 16-bit) is flattened and re-saved as an RGB PNG so the
+    # page still gets PNG's per-row filters, which compress far better than raw pixels.
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    data, _ = png_idat(buffer.getvalue())
+    return EncodedPage(data, width, height, "FlateDecode", dpi, _predictor(width))
+
+
+def _predictor(width: int) -> str:
+    return f"<< /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {width} >>"
+
+
+def prepare_page(image_path: Path, encoding: PageEncoding, cache_root: Path | None = None) -> EncodedPage:
+    image_bytes = image_path.read_bytes()
+    if cache_root is None:
+        return encode_page(image_bytes, encoding)
+    cache = ResponseCache(cache_root)
+    key = cache_key("pdf_page_png", image=content_hash(image_bytes), **asdict(encoding))
+    header = cache.get_json(f"{key}_meta")
+    data = cache.get(key) if header is not None else None
+    if header is not None and data is not None:
+        return EncodedPage(data=data, **header)
+    page = encode_page(image_bytes, encoding)
+    cache.put(key, page.data)
+    cache.put_json(
+        f"{key}_meta",
+        {
+            "width": page.width,
+            "height": page.height,
+            "filter": page.filter,
+            "dpi": page.dpi,
+            "decode_parms": page.decode_parms,
+        },
+    )
+    return page
+
+
+class StreamingPdfWriter:
+    # Writes each page's objects as soon as it is added, keeping only byte offsets in
+    # memory; the page tree, xref table and trailer go out on close().
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, handle: BinaryIO) -> None:
+        self.handle = handle
+        self.offsets: dict[int, int] = {}
+        self.page_ids: list[int] = []
+        self.next_id = 3
+        self.position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self.handle.write(data)
+        self.position += len(data)
+
+    def _object(self, obj_id: int, body: bytes, stream: bytes | None = None) -> None:
+        self.offsets[obj_id] = self.position
+        self._write(f"{obj_id} 0 obj\n".encode("ascii") + body)
+        if stream is not None:
+            self._write(b"\nstream\n")
+            self._write(stream)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def _allocate(self) -> int:
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def add_page(self, page: EncodedPage) -> None:
+        image_id, content_id, page_id = self._allocate(), self._allocate(), self._allocate()
+        page_width = page.width * 72.0 / page.dpi
+        page_height = page.height * 72.0 / page.dpi
+        self._object(
+            image_id,
+            (
+                f"<< /Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /{page.filter} "
+                + (f"/DecodeParms {page.decode_parms} " if page.decode_parms else "")
+                + f"/Length {len(page.data)} >>"
+            ).encode("ascii"),
+            page.data,
+        )
+        content = f"q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q".encode("ascii")
+        self._object(content_id, f"<< /Length {len(content)} >>".encode("ascii"), content)
+        self._object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent {self.PAGES_ID} 0 R "
+                f"/MediaBox [0 0 {page_width:.4f} {page_height:.4f}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+                f"/Contents {content_id} 0 R >>"
+            ).encode("ascii"),
+        )
+        self.page_ids.append(page_id)
+
+    def close(self) -> None:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(
+            self.PAGES_ID,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode("ascii"),
+        )
+        self._object(self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>".encode("ascii"))
+        xref_offset = self.position
+        size = self.next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self.offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._write("".join(lines).encode("ascii"))
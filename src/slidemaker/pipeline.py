@@ -1,15 +1,36 @@
 from __future__ import annotations
 
 import asyncio
-import shutil
-from dataclasses import dataclass
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Callable
 
-from .openai_client import OpenAIGrader, OpenAIImageClient
-from .prompting import build_prompt, refine_prompt
-from .store import load_index, load_slides, load_spec, save_index, save_slides
-from .utils import ensure_dir, ordered_slides, save_json
+from openai import AsyncOpenAI
+
+from .backends import GradeBackend, ImageBackend
+from .blobs import write_image
+from .cache import ResponseCache
+from .dedupe import DEFAULT_DISTANCE, DuplicateIndex, SeenImage
+from .estimate import estimate_slides, load_history
+from .fake import FakeGrader, FakeImageClient, FakeOptions
+from .imaging import GradingImageOptions, ImagePayload, dhash
+from .journal import RunJournal
+from .metrics import CallSpan, MetricsLog
+from .openai_client import (
+    ClientOptions,
+    GradeResult,
+    OpenAIGrader,
+    OpenAIImageClient,
+    create_client,
+)
+from .prefilter import DEFAULT_CHECKS, PrefilterContext, prefilter
+from .prompting import build_prompt, edit_prompt, hard_rubric, refine_prompt
+from .ratelimit import AdaptiveLimiter
+from .scheduler import StageScheduler
+from .store import load_index, load_slides, load_spec, refresh_catalog, run_lock, save_index, save_slides
+from .utils import ensure_dir, link_or_copy, load_json, ordered_slides, save_json
 
 
 @dataclass
@@ -21,46 +42,270 @@ class RunConfig:
     image_background: str
     max_attempts: int
     concurrency: int
+    candidates: int = 1
+    image_concurrency: int | None = None
+    grade_concurrency: int | None = None
+    max_concurrency: int | None = None
+    cache_dir: Path | None = None
+    cache_max_bytes: int = 2 * 1024**3
+    grade_max_width: int = 0
+    grade_format: str = "png"
+    grade_quality: int = 85
+    image_detail: str = "auto"
+    pool_size: int | None = None
+    image_timeout: float = 300.0
+    grade_timeout: float = 120.0
+    http2: bool | None = None
+    priority: float = 1.0
+    image_rpm: float | None = None
+    grade_rpm: float | None = None
+    base_url: str | None = None
+    backend: str = "openai"
+    fake: FakeOptions | None = None
+    # Screen hard rubric items with a cheap low-detail call before the full grade.
+    precheck: bool = False
+    precheck_model: str | None = None
+    # "expected" starts the slides history predicts will take longest first; "outline" keeps deck order.
+    order: str = "expected"
+    # "edit" revises the best attempt so far through the image edit endpoint; after
+    # edit_rounds edit rounds without a better score it falls back to fresh generation.
+    refine_mode: str = "generate"
+    edit_rounds: int = 2
+    # Reuse the failed grade of an earlier attempt within this many dHash bits; None disables.
+    dedupe_distance: int | None = DEFAULT_DISTANCE
+    # Local pixel checks (see prefilter.CHECKS) that reject degenerate images before any grader call.
+    prefilter: tuple[str, ...] = DEFAULT_CHECKS
 
 
 class RunState:
-    def __init__(self, run_root: Path) -> None:
+    def __init__(self, run_root: Path, checkpoint_every: int = 50) -> None:
         self.run_root = run_root
         self.slides = load_slides(run_root)
         self.spec = load_spec(run_root)
         self.index = load_index(run_root)
+        self.journal = RunJournal(
+            run_root,
+            seq=max(self.slides.get("journal_seq", 0), self.index.get("journal_seq", 0)),
+        )
+        self.metrics = MetricsLog(run_root)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seq = self.journal.seq
         self.lock = asyncio.Lock()
+        # Called with every journal event, e.g. to stream progress out of `slidemaker serve`.
+        self.listeners: list[Callable[[dict[str, Any]], None]] = []
+
+    def index_entry(self, slide: dict[str, Any]) -> dict[str, Any]:
+        return self.index.setdefault("slides", {}).setdefault(
+            slide["id"],
+            {
+                "title": slide.get("title"),
+                "final_image": None,
+                "attempts": [],
+            },
+        )
+
+    def record(self, event: dict[str, Any]) -> None:
+        self.journal.append(event)
+        for listener in self.listeners:
+            listener(event)
+
+    def record_attempt(self, slide: dict[str, Any], attempt: dict[str, Any]) -> None:
+        self.index_entry(slide)["attempts"].append(attempt)
+        self.record({"type": "attempt", "slide_id": slide["id"], "title": slide.get("title"), "attempt": attempt})
+
+    def set_final(self, slide: dict[str, Any], final_image: str) -> None:
+        # final/ is a hardlink to the attempt, so its mtime is the generation time, not this.
+        approved_at = time.time()
+        entry = self.index_entry(slide)
+        entry["final_image"] = final_image
+        entry["approved_at"] = approved_at
+        self.record(
+            {
+                "type": "final",
+                "slide_id": slide["id"],
+                "title": slide.get("title"),
+                "final_image": final_image,
+                "approved_at": approved_at,
+            }
+        )
+
+    def record_span(self, slide: dict[str, Any], attempts: list[Candidate], span: CallSpan) -> None:
+        self.metrics.append(
+            {
+                "slide_id": slide["id"],
+                "attempts": [candidate.image_path.stem for candidate in attempts],
+                **span.to_dict(),
+            }
+        )
+
+    def set_status(self, slide: dict[str, Any], status: str) -> None:
+        slide["status"] = status
+        self.record({"type": "status", "slide_id": slide["id"], "status": status})
 
     async def save(self) -> None:
+        if self.journal.seq - self.checkpoint_seq >= self.checkpoint_every:
+            await self.checkpoint()
+
+    async def checkpoint(self) -> None:
         async with self.lock:
+            seq = self.journal.seq
+            self.slides["journal_seq"] = seq
+            self.index["journal_seq"] = seq
             save_slides(self.run_root, self.slides)
             save_index(self.run_root, self.index)
+            self.journal.truncate()
+            self.metrics.close()
+            self.checkpoint_seq = seq
+
+
+@dataclass
+class GenerationContext:
+    client: AsyncOpenAI | None
+    image_client: ImageBackend
+    grader: GradeBackend
+    scheduler: StageScheduler
+
+
+@asynccontextmanager
+async def generation_context(config: RunConfig) -> AsyncIterator[GenerationContext]:
+    image_limit = config.image_concurrency or config.concurrency
+    grade_limit = config.grade_concurrency or config.concurrency
+    image_ceiling = max(config.max_concurrency or image_limit * 4, image_limit)
+    grade_ceiling = max(config.max_concurrency or grade_limit * 4, grade_limit)
+    image_limiter = AdaptiveLimiter(
+        initial=image_limit,
+        maximum=image_ceiling,
+        requests_per_minute=config.image_rpm,
+    )
+    grade_limiter = AdaptiveLimiter(
+        initial=grade_limit,
+        maximum=grade_ceiling,
+        requests_per_minute=config.grade_rpm,
+    )
+    client: AsyncOpenAI | None = None
+    image_client: ImageBackend
+    grader: GradeBackend
+    if config.backend == "fake":
+        fake = config.fake or FakeOptions()
+        image_client = FakeImageClient(options=fake, limiter=image_limiter)
+        grader = FakeGrader(options=fake, limiter=grade_limiter)
+    elif config.backend == "openai":
+        cache = ResponseCache(config.cache_dir, config.cache_max_bytes) if config.cache_dir else None
+        options = ClientOptions(
+            pool_size=config.pool_size or image_ceiling + grade_ceiling,
+            image_timeout=config.image_timeout,
+            grade_timeout=config.grade_timeout,
+            http2=config.http2,
+        )
+        client = create_client(options, base_url=config.base_url)
+        image_client = OpenAIImageClient(limiter=image_limiter, cache=cache, client=client, options=options)
+        grader = OpenAIGrader(
+            limiter=grade_limiter,
+            cache=cache,
+            client=client,
+            options=options,
+            image_options=GradingImageOptions(
+                max_width=config.grade_max_width,
+                format=config.grade_format,
+                quality=config.grade_quality,
+                detail=config.image_detail,
+            ),
+        )
+    else:
+        raise RuntimeError(f"Unknown backend: {config.backend}")
+
+    try:
+        async with StageScheduler(
+            generate_concurrency=image_ceiling,
+            grade_concurrency=grade_ceiling,
+        ) as scheduler:
+            yield GenerationContext(
+                client=client,
+                image_client=image_client,
+                grader=grader,
+                scheduler=scheduler,
+            )
+    finally:
+        if client is not None:
+            await client.close()
 
 
 async def generate_all(config: RunConfig) -> None:
-    state = RunState(config.run_root)
-    slides = ordered_slides(state.slides.get("slides", []))
-    if not slides:
-        raise RuntimeError("No slides found. Run 'outline' and 'draft' first.")
+    await generate_runs([config])
+
+
+async def generate_runs(configs: list[RunConfig]) -> None:
+    if not configs:
+        raise RuntimeError("No runs to generate.")
+    states = [RunState(config.run_root) for config in configs]
+    for config, state in zip(configs, states):
+        if not state.slides.get("slides"):
+            raise RuntimeError(
+                f"No slides found in {config.run_root.name}. Run 'outline' and 'draft' first."
+            )
+
+    # Clients, limiters and worker pools are shared, so every run draws on one global
+    # budget; the first config supplies those shared settings.
+    async with generation_context(configs[0]) as context:
+        results = await asyncio.gather(
+            *(generate_run(config, state, context) for config, state in zip(configs, states)),
+            return_exceptions=True,
+        )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def generate_run(config: RunConfig, state: RunState, context: GenerationContext) -> None:
+    # Two processes on one run would write the same attempt numbers and journal.
+    with run_lock(config.run_root):
+        await _generate_run(config, state, context)
 
-    image_client = OpenAIImageClient()
-    grader = OpenAIGrader()
-    semaphore = asyncio.Semaphore(config.concurrency)
 
+async def _generate_run(config: RunConfig, state: RunState, context: GenerationContext) -> None:
+    refresh_catalog(config.run_root, status="generating")
+    slides = ordered_slides(state.slides.get("slides", []))
+    expected = {slide["id"]: 0.0 for slide in slides}
+    if config.order == "expected":
+        # The run's makespan is set by its slowest slide, so start the likely stragglers first.
+        estimates = estimate_slides(
+            config.run_root,
+            state.spec,
+            slides,
+            await asyncio.to_thread(load_history, config.run_root.parent),
+            candidates=config.candidates,
+            max_attempts=config.max_attempts,
+        )
+        expected = {slide_id: estimate.seconds for slide_id, estimate in estimates.items()}
+        slides.sort(key=lambda slide: -expected[slide["id"]])
     tasks = [
         asyncio.create_task(
             _process_slide(
                 config=config,
                 state=state,
                 slide=slide,
-                image_client=image_client,
-                grader=grader,
-                semaphore=semaphore,
+                image_client=context.image_client,
+                grader=context.grader,
+                scheduler=context.scheduler,
+                expected=expected[slide["id"]],
             )
         )
         for slide in slides
     ]
-    await asyncio.gather(*tasks)
+    status: str | None = "failed"
+    try:
+        await asyncio.gather(*tasks)
+        status = None
+    except asyncio.CancelledError:
+        # A cancelled run (Ctrl-C, a cancelled serve job) is unfinished, not broken.
+        status = None
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await state.checkpoint()
+        refresh_catalog(config.run_root, status=status)
 
 
 async def _process_slide(
@@ -68,26 +313,22 @@ async def _process_slide(
     config: RunConfig,
     state: RunState,
     slide: dict[str, Any],
-    image_client: OpenAIImageClient,
-    grader: OpenAIGrader,
-    semaphore: asyncio.Semaphore,
+    image_client: ImageBackend,
+    grader: GradeBackend,
+    scheduler: StageScheduler,
+    expected: float = 0.0,
 ) -> None:
     slide_id = slide["id"]
     attempt_dir = config.run_root / "attempts" / slide_id
     ensure_dir(attempt_dir)
 
-    index_entry = state.index.setdefault("slides", {}).setdefault(
-        slide_id,
-        {
-            "title": slide.get("title"),
-            "final_image": None,
-            "attempts": [],
-        },
-    )
+    index_entry = state.index_entry(slide)
 
     final_path = config.run_root / "final" / f"{slide_id}.png"
     if slide.get("status") == "approved" and final_path.exists():
-        index_entry["final_image"] = str(final_path.relative_to(config.run_root))
+        final_image = str(final_path.relative_to(config.run_root))
+        if index_entry.get("final_image") != final_image:
+            state.set_final(slide, final_image)
         return
 
     base_prompt = slide.get("prompt") or build_prompt(state.spec, slide)
@@ -95,70 +336,494 @@ async def _process_slide(
     if not rubric:
         raise RuntimeError(f"Slide {slide_id} is missing a rubric.")
 
-    attempt = 0
-    current_prompt = base_prompt
+    resumed = resume_slide(config=config, state=state, slide=slide, base_prompt=base_prompt, rubric=rubric)
+    attempt = resumed.attempt
+    current_prompt = resumed.prompt
+    edits = resumed.edits
+    duplicates: DuplicateIndex | None = None
+    if config.dedupe_distance is not None:
+        duplicates = DuplicateIndex(config.dedupe_distance)
+        duplicates.seen.extend(resumed.seen)
+    mask_path = slide.get("edit_mask")
+    mask = (config.run_root / mask_path).read_bytes() if mask_path else None
+    if resumed.passing is not None:
+        await approve(config=config, state=state, slide=slide, image_path=resumed.passing)
+        return
+
+    size = slide.get("image_size") or state.spec.get("image_size", "1536x1024")
+    local = PrefilterContext(size=size, background=config.image_background)
+    hard = hard_rubric(slide, rubric) if config.precheck else []
+    precheck_model = config.precheck_model or config.grader_model
+    # The API's base64 text is only worth keeping when the grader sends the image unchanged.
+    keep_b64 = grader.image_options.passthrough
+
+    async def _call_grader(candidate: Candidate, tier: str, model: str, criteria: list[str]) -> GradeResult:
+        span = candidate.spans.setdefault(tier, CallSpan(tier, model=model))
+        span.schedule_seconds = time.time() - span.started_at
+        try:
+            result = await grader.grade_image(
+                model=model,
+                rubric=criteria,
+                prompt=candidate.prompt,
+                slide_title=slide.get("title", slide_id),
+                image_bytes=candidate.image_bytes,
+                # The precheck always re-encodes, so the base64 text is saved for the full grade.
+                image_b64=None if tier == "precheck" else candidate.take_b64(),
+                span=span,
+                precheck=tier == "precheck",
+            )
+        except Exception:
+            span.finish("error")
+            state.record_span(slide, [candidate], span)
+            raise
+        span.finish()
+        state.record_span(slide, [candidate], span)
+        return result
+
+    async def _grade(candidate: Candidate) -> GradeResult:
+        if config.prefilter:
+            failures, seconds = await asyncio.to_thread(prefilter, candidate.image_bytes, local, config.prefilter)
+            if failures:
+                candidate.release()
+                return GradeResult(
+                    passed=False,
+                    score=0.0,
+                    failures=failures,
+                    improvements=[],
+                    summary=f"Rejected by local prefilter: {'; '.join(failures)}.",
+                    payload={"tier": "local", "seconds": round(seconds, 4)},
+                )
+        if duplicates is not None:
+            candidate.phash = await asyncio.to_thread(dhash, candidate.image_bytes)
+            # An edit is meant to stay close to its source, so only fresh images are matched.
+            match = None if candidate.generation.get("edit_source") else duplicates.match(candidate.phash)
+            if match is not None:
+                seen, distance = match
+                candidate.release()
+                return GradeResult(
+                    passed=False,
+                    score=seen.grade.get("score", 0.0),
+                    failures=list(seen.grade.get("failures") or []),
+                    improvements=list(seen.grade.get("improvements") or []),
+                    summary=f"Near-duplicate of {seen.attempt}: {seen.grade.get('summary', '')}",
+                    payload={"duplicate_of": seen.attempt, "distance": distance, "seconds": 0.0},
+                )
+        screened: GradeResult | None = None
+        if hard:
+            screened = await _call_grader(candidate, "precheck", precheck_model, hard)
+        if screened is None or screened.passed:
+            result = await _call_grader(candidate, "grade", config.grader_model, rubric)
+            if screened is not None:
+                result.payload["precheck_seconds"] = screened.payload.get("seconds", 0.0)
+        else:
+            # Most failures break one obvious constraint; the full grade would only repeat it.
+            result = screened
+        # The image is on disk; drop the in-memory copies so a round holds at most one
+        # payload per in-flight grade.
+        candidate.release()
+        if duplicates is not None and candidate.phash:
+            duplicates.add(candidate.image_path.stem, candidate.phash, _grade_dict(result))
+        return result
+
+    if resumed.pending:
+        graded = await scheduler.grade_round(
+            candidates=resumed.pending,
+            grade=_grade,
+            group=str(config.run_root),
+            weight=config.priority,
+            priority=expected,
+        )
+        next_prompt = await finish_round(
+            config=config,
+            state=state,
+            slide=slide,
+            rubric=rubric,
+            base_prompt=base_prompt,
+            prompt=current_prompt,
+            graded=graded,
+        )
+        if next_prompt is None:
+            return
+        current_prompt = next_prompt
+        edits.observe(graded, edited=False)
+
+    made = 0
     while True:
-        attempt += 1
-        if config.max_attempts > 0 and attempt > config.max_attempts:
+        if config.max_attempts > 0 and made >= config.max_attempts:
             raise RuntimeError(f"Slide {slide_id} exceeded max attempts ({config.max_attempts}).")
 
-        attempt_name = f"attempt_{attempt:03d}"
-        image_path = attempt_dir / f"{attempt_name}.png"
-        metadata_path = attempt_dir / f"{attempt_name}.json"
-
-        async with semaphore:
-            image_bytes = await image_client.generate_image(
-                model=config.image_model,
-                prompt=current_prompt,
-                size=slide.get("image_size") or state.spec.get("image_size", "1536x1024"),
-                quality=config.image_quality,
-                background=config.image_background,
-            )
+        count = max(config.candidates, 1)
+        if config.max_attempts > 0:
+            count = min(count, config.max_attempts - made)
+        prompt = current_prompt
+        first_attempt = attempt + 1
+        generation: dict[str, Any] = {
+            "image_model": config.image_model,
+            "image_quality": config.image_quality,
+            "size": size,
+        }
+        source = edits.source if config.refine_mode == "edit" and edits.stale < config.edit_rounds else None
+        if source is not None:
+            prompt = edit_prompt(base_prompt, edits.improvements)
+            generation["edit_source"] = str(source.relative_to(config.run_root))
+        image_span = CallSpan("edit" if source is not None else "image", model=config.image_model)
+        prepared: list[Candidate] = []
 
-        image_path.write_bytes(image_bytes)
+        async def _generate() -> list[ImagePayload]:
+            generation["started_at"] = time.time()
+            image_span.schedule_seconds = generation["started_at"] - image_span.started_at
+            start = time.perf_counter()
+            try:
+                if source is not None:
+                    images = await image_client.edit_images(
+                        model=config.image_model,
+                        image_bytes=await asyncio.to_thread(source.read_bytes),
+                        prompt=prompt,
+                        size=size,
+                        quality=config.image_quality,
+                        background=config.image_background,
+                        n=count,
+                        mask=mask,
+                        variant=first_attempt,
+                        span=image_span,
+                    )
+                else:
+                    images = await image_client.generate_images(
+                        model=config.image_model,
+                        prompt=prompt,
+                        size=size,
+                        quality=config.image_quality,
+                        background=config.image_background,
+                        n=count,
+                        variant=first_attempt,
+                        span=image_span,
+                    )
+            except Exception:
+                image_span.finish("error")
+                state.record_span(slide, [], image_span)
+                raise
+            # One call yields every candidate in the round, so they share its latency.
+            generation["generate_seconds"] = round(time.perf_counter() - start, 4)
+            generation["batch_size"] = len(images)
+            return images
 
-        async with semaphore:
-            grade = await grader.grade_image(
-                model=config.grader_model,
-                rubric=rubric,
-                prompt=current_prompt,
-                slide_title=slide.get("title", slide_id),
-                image_bytes=image_bytes,
+        def _prepare(image: ImagePayload) -> Candidate:
+            nonlocal attempt
+            attempt += 1
+            with image_span.timed("write"):
+                candidate = checkpoint_candidate(
+                    attempt_dir=attempt_dir,
+                    attempt=attempt,
+                    image_bytes=image.data,
+                    image_b64=image.b64 if keep_b64 else None,
+                    prompt=prompt,
+                    rubric=rubric,
+                    generation=generation,
+                )
+            candidate.spans["image"] = image_span
+            # Created here so its schedule time covers the wait for a grade worker.
+            if hard:
+                candidate.spans["precheck"] = CallSpan("precheck", model=precheck_model)
+            else:
+                candidate.spans["grade"] = CallSpan("grade", model=config.grader_model)
+            prepared.append(candidate)
+            # The call's span closes once every image it returned is on disk.
+            if len(prepared) == generation["batch_size"]:
+                image_span.finish()
+                state.record_span(slide, prepared, image_span)
+            return candidate
+
+        graded = await scheduler.run_round(
+            generate=_generate,
+            prepare=_prepare,
+            grade=_grade,
+            group=str(config.run_root),
+            weight=config.priority,
+            # Attempts are independent draws, so a slide's expected remaining time does
+            # not shrink as it fails; its retries keep their place ahead of easier slides.
+            priority=expected,
+        )
+        made += len(graded)
+        next_prompt = await finish_round(
+            config=config,
+            state=state,
+            slide=slide,
+            rubric=rubric,
+            base_prompt=base_prompt,
+            prompt=prompt,
+            graded=graded,
+        )
+        if next_prompt is None:
+            return
+        current_prompt = next_prompt
+        edits.observe(graded, edited=source is not None)
+
+
+@dataclass
+class Candidate:
+    image_path: Path
+    metadata_path: Path
+    image_bytes: bytes
+    prompt: str
+    generation: dict[str, Any] = field(default_factory=dict)
+    spans: dict[str, CallSpan] = field(default_factory=dict)
+    image_b64: str | None = None
+    phash: str | None = None
+
+    def release(self) -> None:
+        self.image_bytes = b""
+        self.image_b64 = None
+
+    def take_b64(self) -> str | None:
+        image_b64, self.image_b64 = self.image_b64, None
+        return image_b64
+
+
+def checkpoint_candidate(
+    *,
+    attempt_dir: Path,
+    attempt: int,
+    image_bytes: bytes,
+    prompt: str,
+    rubric: list[str],
+    generation: dict[str, Any] | None = None,
+    image_b64: str | None = None,
+) -> Candidate:
+    attempt_name = f"attempt_{attempt:03d}"
+    candidate = Candidate(
+        image_path=attempt_dir / f"{attempt_name}.png",
+        metadata_path=attempt_dir / f"{attempt_name}.json",
+        image_bytes=image_bytes,
+        prompt=prompt,
+        generation=dict(generation or {}),
+        image_b64=image_b64,
+    )
+    write_image(attempt_dir.parent.parent, candidate.image_path, image_bytes)
+    # Checkpoint the ungraded attempt so a restart grades it instead of paying for a new image.
+    save_json(
+        candidate.metadata_path,
+        {"prompt": prompt, "rubric": rubric, "grade": None, "generation": candidate.generation},
+    )
+    return candidate
+
+
+@dataclass
+class EditState:
+    source: Path | None = None
+    score: float = -1.0
+    improvements: list[str] = field(default_factory=list)
+    stale: int = 0
+
+    def consider(self, image_path: Path, score: float, improvements: list[str]) -> bool:
+        if score <= self.score or not image_path.exists():
+            return False
+        self.source = image_path
+        self.score = score
+        self.improvements = improvements
+        self.stale = 0
+        return True
+
+    def observe(self, graded: list[tuple[Candidate, GradeResult]], *, edited: bool) -> None:
+        improved = False
+        for candidate, grade in graded:
+            if not _full_grade(grade.payload):
+                continue
+            improved |= self.consider(candidate.image_path, grade.score, grade.improvements or grade.failures)
+        if edited and not improved:
+            self.stale += 1
+
+
+def _full_grade(payload: dict[str, Any]) -> bool:
+    # Local, precheck and duplicate verdicts score rejects 0.0 without judging the whole
+    # rubric, so a blank canvas or a wrong-size image must never become an edit source.
+    return "tier" not in payload and "duplicate_of" not in payload
+
+
+@dataclass
+class ResumePoint:
+    attempt: int
+    prompt: str
+    pending: list[Candidate]
+    passing: Path | None
+    edits: EditState = field(default_factory=EditState)
+    seen: list[SeenImage] = field(default_factory=list)
+
+
+def _attempt_number(path: Path) -> int:
+    try:
+        return int(path.stem.rsplit("_", 1)[-1])
+    except ValueError:
+        return 0
+
+
+def _attempt_record(
+    config: RunConfig,
+    image_path: Path,
+    metadata_path: Path,
+    metadata: dict[str, Any],
+) -> dict[str, Any]:
+    grade = metadata["grade"]
+    generation = metadata.get("generation") or {}
+    payload = metadata.get("grade_payload") or {}
+    record = {
+        "file": str(image_path.relative_to(config.run_root)),
+        "metadata": str(metadata_path.relative_to(config.run_root)),
+        "pass": grade["pass"],
+        "score": grade["score"],
+        "failures": grade["failures"],
+        "summary": grade["summary"],
+    }
+    for key in (
+        "started_at",
+        "generate_seconds",
+        "batch_size",
+        "batch",
+        "image_model",
+        "image_quality",
+        "size",
+        "edit_source",
+    ):
+        if key in generation:
+            record[key] = generation[key]
+    if "seconds" in payload:
+        record["grade_seconds"] = payload["seconds"]
+    if payload.get("batch"):
+        record["grade_batch"] = True
+    if payload.get("cached"):
+        record["grade_cached"] = True
+    if "duplicate_of" in payload:
+        record["duplicate_of"] = payload["duplicate_of"]
+    if "tier" in payload:
+        record["grade_tier"] = payload["tier"]
+    if "precheck_seconds" in payload:
+        record["precheck_seconds"] = payload["precheck_seconds"]
+    for key in ("input_tokens", "output_tokens"):
+        if key in payload:
+            record[key] = payload[key]
+    return record
+
+
+def resume_slide(
+    *,
+    config: RunConfig,
+    state: RunState,
+    slide: dict[str, Any],
+    base_prompt: str,
+    rubric: list[str] | None = None,
+) -> ResumePoint:
+    attempt_dir = config.run_root / "attempts" / slide["id"]
+    recorded = {item.get("metadata") for item in state.index_entry(slide)["attempts"]}
+    attempt = max((_attempt_number(path) for path in attempt_dir.glob("attempt_*.*")), default=0)
+
+    pending: list[Candidate] = []
+    graded: list[tuple[int, Path, dict[str, Any]]] = []
+    for metadata_path in sorted(attempt_dir.glob("attempt_*.json"), key=_attempt_number):
+        image_path = metadata_path.with_suffix(".png")
+        metadata = load_json(metadata_path, {})
+        if not metadata:
+            continue
+        grade = metadata.get("grade")
+        if grade is None:
+            if not image_path.exists():
+                continue
+            pending.append(
+                Candidate(
+                    image_path=image_path,
+                    metadata_path=metadata_path,
+                    image_bytes=image_path.read_bytes(),
+                    prompt=metadata.get("prompt") or base_prompt,
+                    generation=metadata.get("generation") or {},
+                )
             )
+            continue
+        if str(metadata_path.relative_to(config.run_root)) not in recorded:
+            state.record_attempt(slide, _attempt_record(config, image_path, metadata_path, metadata))
+        graded.append((_attempt_number(metadata_path), image_path, metadata))
+
+    passing = [item for item in graded if item[2]["grade"].get("pass") and item[1].exists()]
+    if passing:
+        _, image_path, _ = max(passing, key=lambda item: item[2]["grade"].get("score", 0.0))
+        return ResumePoint(attempt=attempt, prompt=base_prompt, pending=[], passing=image_path)
+
+    prompt = base_prompt
+    edits = EditState()
+    if graded:
+        last_prompt = graded[-1][2].get("prompt") or ""
+        # A prompt edited since the last run invalidates the old refinements.
+        if last_prompt.startswith(base_prompt):
+            last_round = [metadata for _, _, metadata in graded if metadata.get("prompt") == last_prompt]
+            best = max(last_round, key=lambda metadata: metadata["grade"].get("score", 0.0))["grade"]
+            prompt = refine_prompt(base_prompt, best.get("improvements") or best.get("failures") or [])
+        for _, image_path, metadata in graded:
+            if (metadata.get("prompt") or "").startswith(base_prompt) and _full_grade(
+                metadata.get("grade_payload") or {}
+            ):
+                grade = metadata["grade"]
+                improvements = grade.get("improvements") or grade.get("failures") or []
+                edits.consider(image_path, grade.get("score", 0.0), improvements)
+    # Old grades are only reusable for duplicates if they were judged against the same rubric.
+    seen = [
+        SeenImage(image_path.stem, metadata["phash"], metadata["grade"])
+        for _, image_path, metadata in graded
+        if metadata.get("phash") and metadata.get("rubric") == rubric
+    ]
+    return ResumePoint(attempt=attempt, prompt=prompt, pending=pending, passing=None, edits=edits, seen=seen)
+
 
+def _grade_dict(grade: GradeResult) -> dict[str, Any]:
+    return {
+        "pass": grade.passed,
+        "score": grade.score,
+        "failures": grade.failures,
+        "improvements": grade.improvements,
+        "summary": grade.summary,
+    }
+
+
+async def finish_round(
+    *,
+    config: RunConfig,
+    state: RunState,
+    slide: dict[str, Any],
+    rubric: list[str],
+    base_prompt: str,
+    prompt: str,
+    graded: list[tuple[Candidate, GradeResult]],
+) -> str | None:
+    for candidate, grade in graded:
         metadata = {
-            "prompt": current_prompt,
+            "prompt": candidate.prompt,
             "rubric": rubric,
-            "grade": {
-                "pass": grade.passed,
-                "score": grade.score,
-                "failures": grade.failures,
-                "improvements": grade.improvements,
-                "summary": grade.summary,
-            },
+            "grade": _grade_dict(grade),
+            "grade_payload": grade.payload,
+            "generation": candidate.generation,
+            "spans": {name: span.to_dict() for name, span in candidate.spans.items()},
         }
-        save_json(metadata_path, metadata)
-
-        index_entry["attempts"].append(
-            {
-                "file": str(image_path.relative_to(config.run_root)),
-                "metadata": str(metadata_path.relative_to(config.run_root)),
-                "pass": grade.passed,
-                "score": grade.score,
-                "failures": grade.failures,
-                "summary": grade.summary,
-            }
+        if candidate.phash:
+            metadata["phash"] = candidate.phash
+        save_json(candidate.metadata_path, metadata)
+        state.record_attempt(
+            slide,
+            _attempt_record(config, candidate.image_path, candidate.metadata_path, metadata),
         )
 
-        if grade.passed:
-            final_path = config.run_root / "final" / f"{slide_id}.png"
-            shutil.copyfile(image_path, final_path)
-            index_entry["final_image"] = str(final_path.relative_to(config.run_root))
-            slide["status"] = "approved"
-            await state.save()
-            return
+    passing = [item for item in graded if item[1].passed]
+    if passing:
+        candidate, _ = max(passing, key=lambda item: item[1].score)
+        await approve(config=config, state=state, slide=slide, image_path=candidate.image_path)
+        return None
+
+    state.set_status(slide, "retrying")
+    await state.save()
+    if not graded:
+        return prompt
+    _, best = max(graded, key=lambda item: item[1].score)
+    return refine_prompt(base_prompt, best.improvements or best.failures)
+
 
-        slide["status"] = "retrying"
-        improvements = grade.improvements or grade.failures
-        current_prompt = refine_prompt(base_prompt, improvements)
-        await state.save()
+async def approve(*, config: RunConfig, state: RunState, slide: dict[str, Any], image_path: Path) -> None:
+    final_path = config.run_root / "final" / f"{slide['id']}.png"
+    link_or_copy(image_path, final_path)
+    state.set_final(slide, str(final_path.relative_to(config.run_root)))
+    state.set_status(slide, "approved")
+    await state.save()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import io
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+from PIL import Image
+
+
+# Longest side the pixel checks look at; plenty for uniformity and edge statistics.
+ANALYSIS_SIZE = 512
+# Flat slide designs are mostly background: real attempts put ~5% of their pixels more
+# than CONTENT_DELTA luma levels off the dominant tone; blanks stay well under MIN_CONTENT.
+CONTENT_DELTA = 16
+MIN_CONTENT = 0.005
+# Share of pixels that may disagree with the requested background before it counts.
+ALPHA_TOLERANCE = 0.01
+BORDER_FRACTION = 0.02
+EDGE_THRESHOLD = 48
+BORDER_EDGE_DENSITY = 0.2
+
+
+@dataclass
+class Pixels:
+    width: int
+    height: int
+    # Downscaled RGBA and luma copies used by the statistical checks.
+    rgba: np.ndarray
+    luma: np.ndarray
+
+
+@dataclass
+class PrefilterContext:
+    size: str
+    background: str
+
+
+Check = Callable[[Pixels, PrefilterContext], "str | None"]
+
+
+def check_dimensions(pixels: Pixels, context: PrefilterContext) -> str | None:
+    try:
+        width, height = (int(part) for part in context.size.split("x"))
+    except ValueError:
+        return None
+    if (pixels.width, pixels.height) != (width, height):
+        return f"The image must be {width}x{height}, not {pixels.width}x{pixels.height}"
+    return None
+
+
+def check_uniform(pixels: Pixels, context: PrefilterContext) -> str | None:
+    dominant = int(np.bincount(pixels.luma.ravel(), minlength=256).argmax())
+    content = float((np.abs(pixels.luma.astype(np.int16) - dominant) > CONTENT_DELTA).mean())
+    if content < MIN_CONTENT:
+        return "The image must show the described content instead of a blank or nearly uniform canvas"
+    return None
+
+
+def check_alpha(pixels: Pixels, context: PrefilterContext) -> str | None:
+    alpha = pixels.rgba[..., 3]
+    transparent = float((alpha < 255).mean())
+    if context.background == "opaque" and transparent > ALPHA_TOLERANCE:
+        return "The background must be fully opaque with no transparent areas"
+    if context.background == "transparent" and transparent < ALPHA_TOLERANCE:
+        return "The background must be transparent around the subject"
+    return None
+
+
+def check_border(pixels: Pixels, context: PrefilterContext) -> str | None:
+    luma = pixels.luma.astype(np.int16)
+    height, width = luma.shape
+    band = max(int(min(height, width) * BORDER_FRACTION), 2)
+    # Content cut off by the frame leaves its outlines crossing the edge: strong horizontal
+    # gradients along the top and bottom bands, vertical ones along the sides.
+    across = np.abs(np.diff(luma, axis=1)) > EDGE_THRESHOLD
+    down = np.abs(np.diff(luma, axis=0)) > EDGE_THRESHOLD
+    densities = [
+        across[:band, :].mean(),
+        across[-band:, :].mean(),
+        down[:, :band].mean(),
+        down[:, -band:].mean(),
+    ]
+    interior = float(across[band:-band, band:-band].mean() + down[band:-band, band:-band].mean()) / 2
+    if max(densities) > max(BORDER_EDGE_DENSITY, interior * 2):
+        return "Keep every element fully inside the frame with a clear margin instead of cutting it off at the edges"
+    return None
+
+
+CHECKS: dict[str, Check] = {
+    "dimensions": check_dimensions,
+    "uniform": check_uniform,
+    "alpha": check_alpha,
+    "border": check_border,
+}
+# Full-bleed artwork legitimately runs into the edges, so the crop heuristic is opt-in.
+DEFAULT_CHECKS = ("dimensions", "uniform", "alpha")
+
+
+def register_check(name: str, check: Check) -> None:
+    CHECKS[name] = check
+
+
+def load_pixels(image_bytes: bytes) -> Pixels:
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        rgba = image.convert("RGBA")
+    rgba.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.Resampling.BOX)
+    array = np.asarray(rgba)
+    # ITU-R 601 luma, computed once for every check.
+    luma = (array[..., :3] @ np.array([0.299, 0.587, 0.114])).astype(np.uint8)
+    return Pixels(width=width, height=height, rgba=array, luma=luma)
+
+
+def prefilter(image_bytes: bytes, context: PrefilterContext, checks: tuple[str, ...]) -> tuple[list[str], float]:
+    start = time.perf_counter()
+    pixels = load_pixels(image_bytes)
+    failures = []
+    for name in checks:
+        failure = CHECKS[name](pixels, context)
+        if failure:
+            failures.append(failure)
+    return failures, time.perf_counter() - start
@@ -81,6 +81,18 @@ def build_rubric(spec: dict[str, Any], slide: dict[str, Any]) -> list[str]:
     return rubric
 
 
+# Rubric items phrased as outright prohibitions or exact requirements; these are cheap to
+# check on a low-detail image and are what most failed attempts trip over.
+HARD_RUBRIC_PREFIXES = ("No ", "Only ", "Exactly ")
+
+
+def hard_rubric(slide: dict[str, Any], rubric: list[str]) -> list[str]:
+    explicit = slide.get("hard_rubric")
+    if explicit is not None:
+        return list(explicit)
+    return [item for item in rubric if item.startswith(HARD_RUBRIC_PREFIXES)]
+
+
 def refine_prompt(base_prompt: str, improvements: list[str]) -> str:
     if not improvements:
         return base_prompt
@@ -88,6 +100,13 @@ def refine_prompt(base_prompt: str, improvements: list[str]) -> str:
     return f"{base_prompt} Refinements: {improvements_text}."
 
 
+def edit_prompt(base_prompt: str, improvements: list[str]) -> str:
+    if not improvements:
+        return base_prompt
+    improvements_text = "; ".join(improvements)
+    return f"{base_prompt} Edit this image: keep what already works and change only: {improvements_text}."
+
+
 def slide_id(index: int, title: str) -> str:
     slug = slugify(title)
     return f"{index:02d}_{slug}"
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Mapping
+
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str | None) -> float | None:
+    if not value:
+        return None
+    text = value.strip().lower()
+    try:
+        return max(float(text), 0.0)
+    except ValueError:
+        pass
+    parts = DURATION_RE.findall(text)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Mapping[str, str] | None) -> float | None:
+    if not headers:
+        return None
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return max(float(retry_ms) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        seconds = parse_duration(retry_after)
+        if seconds is not None:
+            return seconds
+        try:
+            parsed = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is not None:
+            return max(parsed.timestamp() - time.time(), 0.0)
+    resets = [
+        parse_duration(headers.get("x-ratelimit-reset-requests")),
+        parse_duration(headers.get("x-ratelimit-reset-tokens")),
+    ]
+    resets = [value for value in resets if value is not None]
+    return min(resets) if resets else None
+
+
+def _remaining(headers: Mapping[str, str], key: str) -> int | None:
+    value = headers.get(key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        *,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        jitter: float = 0.25,
+        requests_per_minute: float | None = None,
+    ) -> None:
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.jitter = jitter
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.next_start = 0.0
+        self.condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait > 0:
+                    # Spread waiters over a window so they don't all resume at once.
+                    delay = wait + random.uniform(0, wait * self.jitter)
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < int(self.limit):
+                    break
+                await self.condition.wait()
+            self.in_flight += 1
+            delay = 0.0
+            if self.interval > 0:
+                now = time.monotonic()
+                start = max(now, self.next_start)
+                self.next_start = start + self.interval
+                delay = start - now
+        if delay > 0:
+            # Hold the slot while waiting out the request-rate budget.
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                await self.release()
+                raise
+
+    async def release(self) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def observe_success(self, headers: Mapping[str, str] | None) -> None:
+        headers = headers or {}
+        exhausted = False
+        for kind in ("requests", "tokens"):
+            left = _remaining(headers, f"x-ratelimit-remaining-{kind}")
+            if left is not None and left <= 0:
+                exhausted = True
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self._pause(reset)
+        if exhausted:
+            return
+        requests_left = _remaining(headers, "x-ratelimit-remaining-requests")
+        if requests_left is not None and requests_left <= self.in_flight:
+            return
+        # Additive increase: roughly one extra slot per window of successful calls.
+        self.limit = min(self.limit + self.increase / max(self.limit, 1.0), float(self.maximum))
+
+    def observe_rate_limit(self, headers: Mapping[str, str] | None) -> float | None:
+        delay = retry_after_seconds(headers)
+        now = time.monotonic()
+        # Only back off once per storm; requests already in flight report the same 429.
+        if now - self.last_decrease > max(delay or 0.0, 1.0):
+            self.limit = max(self.limit * self.decrease, float(self.minimum))
+            self.last_decrease = now
+        if delay is not None:
+            self._pause(delay)
+        return delay
+
+    def _pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
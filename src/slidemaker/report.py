@@ -3,20 +3,30 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Any
 
+from .thumbnails import ensure_thumbnails
 from .utils import ordered_slides, write_text
 
 
-def build_report(run_root: Path, slides: list[dict[str, Any]]) -> Path:
+def build_report(run_root: Path, slides: list[dict[str, Any]], *, workers: int | None = None) -> Path:
     ordered = ordered_slides(slides)
-    rows = []
+    finals = []
     for slide in ordered:
         slide_id = slide.get("id")
-        title = slide.get("title", slide_id)
         image_path = run_root / "final" / f"{slide_id}.png"
-        if not image_path.exists():
-            continue
+        if image_path.exists():
+            finals.append((slide, image_path))
+    thumbnails = ensure_thumbnails(run_root, [path for _, path in finals], workers=workers)
+
+    rows = []
+    for slide, image_path in finals:
+        slide_id = slide.get("id")
+        title = slide.get("title", slide_id)
+        thumb = thumbnails[image_path]
         rows.append(
-            f"<figure><img src=\"{image_path.relative_to(run_root)}\" alt=\"{title}\"/>"
+            f"<figure><a href=\"{image_path.relative_to(run_root)}\">"
+            f"<img src=\"{thumb.src}\" srcset=\"{thumb.srcset}\" "
+            f"sizes=\"(max-width: 600px) 100vw, 360px\" width=\"{thumb.width}\" height=\"{thumb.height}\" "
+            f"loading=\"lazy\" decoding=\"async\" alt=\"{title}\"/></a>"
             f"<figcaption><strong>{slide_id}</strong> - {title}</figcaption></figure>"
         )
 
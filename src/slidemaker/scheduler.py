@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _Round(Generic[T, R]):
+    generate: Callable[[], Awaitable[list[bytes]]]
+    prepare: Callable[[bytes], T]
+    grade: Callable[[T], Awaitable[R]]
+    future: asyncio.Future
+    group: str = ""
+    weight: float = 1.0
+    priority: float = 0.0
+    results: list[tuple[T, R] | None] = field(default_factory=list)
+    pending: int = 0
+
+    def fail(self, exc: BaseException) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class FairQueue(Generic[T]):
+    # Stride scheduling across groups: each group advances its pass by 1/weight per
+    # item taken, and the group with the lowest pass goes next. Within a group the
+    # highest priority goes first, then FIFO.
+    def __init__(self) -> None:
+        self.groups: dict[str, list[tuple[float, int, T]]] = {}
+        self.weights: dict[str, float] = {}
+        self.passes: dict[str, float] = {}
+        self.clock = 0.0
+        self.seq = itertools.count()
+        self.tokens: asyncio.Queue[None] = asyncio.Queue()
+
+    def put_nowait(self, item: T, group: str = "", weight: float = 1.0, priority: float = 0.0) -> None:
+        queue = self.groups.setdefault(group, [])
+        if not queue:
+            # A group returning from idle must not cash in credit it built up while away.
+            self.passes[group] = max(self.passes.get(group, 0.0), self.clock)
+        heapq.heappush(queue, (-priority, next(self.seq), item))
+        self.weights[group] = max(weight, 1e-6)
+        self.tokens.put_nowait(None)
+
+    async def get(self) -> T:
+        await self.tokens.get()
+        group = min(
+            (name for name, queue in self.groups.items() if queue),
+            key=lambda name: self.passes[name],
+        )
+        self.clock = self.passes[group]
+        self.passes[group] += 1.0 / self.weights[group]
+        return heapq.heappop(self.groups[group])[2]
+
+
+async def _no_images() -> list[bytes]:
+    return []
+
+
+def _no_prepare(image_bytes: bytes) -> Any:
+    raise RuntimeError("grade-only rounds do not prepare images")
+
+
+class StageScheduler:
+    def __init__(self, *, generate_concurrency: int, grade_concurrency: int) -> None:
+        self.generate_concurrency = max(generate_concurrency, 1)
+        self.grade_concurrency = max(grade_concurrency, 1)
+        self.generate_queue: FairQueue[_Round[Any, Any]] = FairQueue()
+        self.grade_queue: FairQueue[tuple[_Round[Any, Any], int, Any]] = FairQueue()
+        self.workers: list[asyncio.Task[None]] = []
+
+    async def __aenter__(self) -> StageScheduler:
+        self.workers = [
+            asyncio.create_task(self._generate_worker()) for _ in range(self.generate_concurrency)
+        ] + [asyncio.create_task(self._grade_worker()) for _ in range(self.grade_concurrency)]
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def run_round(
+        self,
+        *,
+        generate: Callable[[], Awaitable[list[bytes]]],
+        prepare: Callable[[bytes], T],
+        grade: Callable[[T], Awaitable[R]],
+        group: str = "",
+        weight: float = 1.0,
+        priority: float = 0.0,
+    ) -> list[tuple[T, R]]:
+        future = asyncio.get_running_loop().create_future()
+        job: _Round[T, R] = _Round(
+            generate=generate,
+            prepare=prepare,
+            grade=grade,
+            future=future,
+            group=group,
+            weight=weight,
+            priority=priority,
+        )
+        self.generate_queue.put_nowait(job, group, weight, priority)
+        return await future
+
+    async def grade_round(
+        self,
+        *,
+        candidates: list[T],
+        grade: Callable[[T], Awaitable[R]],
+        group: str = "",
+        weight: float = 1.0,
+        priority: float = 0.0,
+    ) -> list[tuple[T, R]]:
+        if not candidates:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        job: _Round[T, R] = _Round(
+            generate=_no_images,
+            prepare=_no_prepare,
+            grade=grade,
+            future=future,
+            group=group,
+            weight=weight,
+            priority=priority,
+            results=[None] * len(candidates),
+            pending=len(candidates),
+        )
+        for slot, candidate in enumerate(candidates):
+            self.grade_queue.put_nowait((job, slot, candidate), group, weight, priority)
+        return await future
+
+    async def _generate_worker(self) -> None:
+        while True:
+            job = await self.generate_queue.get()
+            if job.future.done():
+                continue
+            try:
+                # No local name for the payloads: once prepared, only the candidates hold them.
+                candidates = [job.prepare(image) for image in await job.generate()]
+            except Exception as exc:  # noqa: BLE001
+                job.fail(exc)
+                continue
+            if not candidates:
+                # The awaiting round may have been cancelled while it generated.
+                if not job.future.done():
+                    job.future.set_result([])
+                continue
+            job.results = [None] * len(candidates)
+            job.pending = len(candidates)
+            for slot, candidate in enumerate(candidates):
+                self.grade_queue.put_nowait((job, slot, candidate), job.group, job.weight, job.priority)
+
+    async def _grade_worker(self) -> None:
+        while True:
+            job, slot, candidate = await self.grade_queue.get()
+            if job.future.done():
+                continue
+            try:
+                result = await job.grade(candidate)
+            except Exception as exc:  # noqa: BLE001
+                job.fail(exc)
+                continue
+            job.results[slot] = (candidate, result)
+            job.pending -= 1
+            if job.pending == 0 and not job.future.done():
+                job.future.set_result(list(job.results))
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import signal
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field, replace
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+
+from .history import Prices, build_history
+from .pipeline import GenerationContext, RunConfig, RunState, generate_run, generation_context
+from .report import build_report
+from .store import run_dir
+from .utils import ensure_dir
+
+
+JOB_KINDS = ("generate", "report")
+# RunConfig fields a job may override, with the JSON types each accepts. Clients, limiters and
+# the scheduler are built once from the daemon's own settings, so connection and concurrency
+# options are fixed.
+JOB_OPTIONS: dict[str, tuple[type, ...]] = {
+    "image_model": (str,),
+    "grader_model": (str,),
+    "image_quality": (str,),
+    "image_background": (str,),
+    "max_attempts": (int,),
+    "candidates": (int,),
+    "priority": (int, float),
+    "order": (str,),
+    "refine_mode": (str,),
+    "edit_rounds": (int,),
+    "precheck": (bool,),
+    "precheck_model": (str, type(None)),
+}
+REPORT_OPTIONS: dict[str, tuple[type, ...]] = {
+    "history": (bool,),
+    "workers": (int, type(None)),
+}
+OPTION_CHOICES = {
+    "image_quality": ("auto", "low", "medium", "high"),
+    "image_background": ("opaque", "transparent", "auto"),
+    "order": ("expected", "outline"),
+    "refine_mode": ("generate", "edit"),
+}
+OPTION_MINIMUMS = {"max_attempts": 0, "candidates": 1, "edit_rounds": 0, "workers": 1}
+# Finished jobs kept for GET /jobs; older ones are dropped along with their event buffers.
+KEEP_JOBS = 100
+FINISHED = ("done", "failed", "cancelled")
+STATE_FILES = ("spec.json", "slides.json", "index.json", "journal.jsonl")
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    run_id: str
+    options: dict[str, Any]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    result: dict[str, Any] = field(default_factory=dict)
+    events: list[dict[str, Any]] = field(default_factory=list)
+    subscribers: set[asyncio.Queue[dict[str, Any] | None]] = field(default_factory=set)
+    task: asyncio.Task[None] | None = None
+
+    def emit(self, event: dict[str, Any]) -> None:
+        event = {"seq": len(self.events) + 1, "time": time.time(), **event}
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        self.emit({"type": "job", "status": status})
+        if status in FINISHED:
+            for queue in self.subscribers:
+                queue.put_nowait(None)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "run": self.run_id,
+            "options": self.options,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "result": self.result,
+            "events": len(self.events),
+        }
+
+
+def _fingerprint(run_root: Path) -> tuple[int, ...]:
+    return tuple(
+        (run_root / name).stat().st_mtime_ns if (run_root / name).exists() else 0 for name in STATE_FILES
+    )
+
+
+def _check_options(options: Any) -> dict[str, Any]:
+    if not isinstance(options, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Job options must be a JSON object")
+    allowed = {**JOB_OPTIONS, **REPORT_OPTIONS}
+    unknown = sorted(set(options) - set(allowed))
+    if unknown:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Unsupported options: {', '.join(unknown)}")
+    for key, value in options.items():
+        types = allowed[key]
+        # JSON true/false decode to bool, which Python also counts as an int.
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            expected = " or ".join("null" if kind is type(None) else kind.__name__ for kind in types)
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Option {key} must be {expected}")
+        if key in OPTION_CHOICES and value not in OPTION_CHOICES[key]:
+            raise RequestError(
+                HTTPStatus.BAD_REQUEST,
+                f"Option {key} must be one of {', '.join(OPTION_CHOICES[key])}",
+            )
+        if value is not None and key in OPTION_MINIMUMS and value < OPTION_MINIMUMS[key]:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Option {key} must be at least {OPTION_MINIMUMS[key]}")
+        if key == "priority" and value <= 0:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Option priority must be positive")
+    return options
+
+
+class SlideServer:
+    def __init__(
+        self,
+        config: RunConfig,
+        base_dir: Path,
+        context: GenerationContext,
+        keep_jobs: int = KEEP_JOBS,
+    ) -> None:
+        self.config = config
+        self.base_dir = base_dir
+        self.context = context
+        self.keep_jobs = keep_jobs
+        self.started_at = time.time()
+        self.jobs: dict[str, Job] = {}
+        # Warm RunStates keyed by run id, with the on-disk fingerprint they were last in sync with.
+        self.states: dict[str, tuple[RunState, tuple[int, ...]]] = {}
+
+    def _state(self, run_root: Path) -> RunState:
+        cached = self.states.get(run_root.name)
+        if cached is not None and cached[1] == _fingerprint(run_root):
+            return cached[0]
+        # Edited by a CLI command (draft, outline, a manual fix) since the last job.
+        state = RunState(run_root)
+        self.states[run_root.name] = (state, _fingerprint(run_root))
+        return state
+
+    def submit(self, payload: dict[str, Any]) -> Job:
+        kind = payload.get("kind", "generate")
+        run_id = payload.get("run")
+        if kind not in JOB_KINDS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Unknown job kind: {kind}")
+        if not isinstance(run_id, str) or not run_id or "/" in run_id or run_id.startswith("."):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "A job needs a run id")
+        if not (run_dir(self.base_dir, run_id) / "slides.json").exists():
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No slides found for run {run_id}")
+        options = _check_options(payload.get("options") or {})
+        for job in self.jobs.values():
+            if job.run_id == run_id and job.status not in FINISHED:
+                raise RequestError(HTTPStatus.CONFLICT, f"Run {run_id} already has job {job.id}")
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind, run_id=run_id, options=options)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def cancel(self, job: Job) -> None:
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+
+    async def shutdown(self) -> None:
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _prune(self) -> None:
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in FINISHED),
+            key=lambda job: job.finished_at or 0.0,
+        )
+        for job in finished[: max(len(finished) - self.keep_jobs, 0)]:
+            del self.jobs[job.id]
+
+    async def _run(self, job: Job) -> None:
+        job.started_at = time.time()
+        job.set_status("running")
+        status = "done"
+        try:
+            if job.kind == "generate":
+                await self._generate(job)
+            else:
+                await self._report(job)
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as exc:  # noqa: BLE001
+            job.error = str(exc)
+            status = "failed"
+        job.finished_at = time.time()
+        job.set_status(status)
+        self._prune()
+
+    async def _generate(self, job: Job) -> None:
+        run_root = run_dir(self.base_dir, job.run_id)
+        ensure_dir(run_root / "attempts")
+        ensure_dir(run_root / "final")
+        overrides = {key: value for key, value in job.options.items() if key in JOB_OPTIONS}
+        config = replace(self.config, run_root=run_root, **overrides)
+        state = self._state(run_root)
+        if not state.slides.get("slides"):
+            raise RuntimeError(f"No slides found in {job.run_id}. Run 'outline' and 'draft' first.")
+        state.listeners.append(job.emit)
+        try:
+            await generate_run(config, state, self.context)
+        finally:
+            state.listeners.remove(job.emit)
+            self.states[job.run_id] = (state, _fingerprint(run_root))
+        slides = state.slides.get("slides", [])
+        job.result = {
+            "slides": len(slides),
+            "approved": sum(1 for slide in slides if slide.get("status") == "approved"),
+        }
+
+    async def _report(self, job: Job) -> None:
+        run_root = run_dir(self.base_dir, job.run_id)
+        slides = self._state(run_root).slides.get("slides", [])
+        workers = job.options.get("workers")
+        if job.options.get("history"):
+            path = await asyncio.to_thread(build_history, run_root, slides, prices=Prices(), workers=workers)
+        else:
+            path = await asyncio.to_thread(build_report, run_root, slides, workers=workers)
+        job.result = {"path": str(path)}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await _read_request(reader)
+            await self._route(method, path, body, writer)
+        except RequestError as exc:
+            await _respond(writer, exc.status, {"error": str(exc)})
+        except (ValueError, UnicodeDecodeError, asyncio.IncompleteReadError) as exc:
+            await _respond(writer, HTTPStatus.BAD_REQUEST, {"error": str(exc) or "Malformed request"})
+        except ConnectionError:
+            pass
+        except Exception as exc:  # noqa: BLE001
+            traceback.print_exc()
+            with contextlib.suppress(Exception):
+                await _respond(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(exc) or type(exc).__name__})
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if parts == ["health"] and method == "GET":
+            running = sum(1 for job in self.jobs.values() if job.status not in FINISHED)
+            await _respond(
+                writer,
+                HTTPStatus.OK,
+                {"ok": True, "uptime": round(time.time() - self.started_at, 1), "running": running},
+            )
+            return
+        if parts == ["jobs"] and method == "GET":
+            await _respond(writer, HTTPStatus.OK, {"jobs": [job.to_dict() for job in self.jobs.values()]})
+            return
+        if parts == ["jobs"] and method == "POST":
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+            await _respond(writer, HTTPStatus.ACCEPTED, self.submit(payload).to_dict())
+            return
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"No job {parts[1]}")
+            if len(parts) == 2 and method == "GET":
+                await _respond(writer, HTTPStatus.OK, job.to_dict())
+                return
+            if len(parts) == 2 and method == "DELETE":
+                self.cancel(job)
+                await _respond(writer, HTTPStatus.ACCEPTED, job.to_dict())
+                return
+            if parts[2:] == ["events"] and method == "GET":
+                await _stream_events(writer, job)
+                return
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    method, path, _ = request_line.split(" ", 2)
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, body
+
+
+def _head(status: HTTPStatus, content_type: str, length: int | None = None) -> bytes:
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}", "Connection: close"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict[str, Any]) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(_head(status, "application/json", len(body)) + body)
+    await writer.drain()
+
+
+async def _stream_events(writer: asyncio.StreamWriter, job: Job) -> None:
+    # NDJSON: every event so far, then live ones until the job finishes.
+    queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+    backlog = list(job.events)
+    if job.status in FINISHED:
+        queue.put_nowait(None)
+    else:
+        job.subscribers.add(queue)
+    try:
+        writer.write(_head(HTTPStatus.OK, "application/x-ndjson"))
+        for event in backlog:
+            writer.write(json.dumps(event).encode("utf-8") + b"\n")
+        await writer.drain()
+        while (event := await queue.get()) is not None:
+            writer.write(json.dumps(event).encode("utf-8") + b"\n")
+            await writer.drain()
+    finally:
+        job.subscribers.discard(queue)
+
+
+async def serve(
+    config: RunConfig,
+    base_dir: Path,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Path | None = None,
+    keep_jobs: int = KEEP_JOBS,
+) -> None:
+    async with generation_context(config) as context:
+        server = SlideServer(config, base_dir, context, keep_jobs=keep_jobs)
+        if socket_path is not None:
+            if socket_path.exists():
+                socket_path.unlink()
+            listener = await asyncio.start_unix_server(server.handle, path=str(socket_path))
+            address = f"unix:{socket_path}"
+        else:
+            listener = await asyncio.start_server(server.handle, host, port)
+            address = f"http://{host}:{port}"
+        print(f"Serving on {address}", flush=True)
+        # SIGTERM is how a daemon is normally stopped; it takes the same path as Ctrl-C.
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, stopping.set)
+        try:
+            async with listener:
+                await stopping.wait()
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            # Cancelled jobs checkpoint their runs before the shared clients close.
+            await server.shutdown()
+            if socket_path is not None and socket_path.exists():
+                socket_path.unlink()
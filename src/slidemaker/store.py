@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
+from .catalog import RunCatalog
+from .journal import apply_index_event, apply_slides_event, read_journal
 from .utils import ensure_dir, load_json, save_json
 
 
 RUNS_DIR_NAME = "runs"
+LOCK_NAME = "generate.lock"
+# Locks this process holds, so a reused pid is not mistaken for a live owner.
+_held_locks: set[Path] = set()
 
 
 def runs_root(base_dir: Path) -> Path:
@@ -17,15 +27,124 @@ def run_dir(base_dir: Path, run_id: str) -> Path:
     return runs_root(base_dir) / run_id
 
 
+def catalog(base_dir: Path) -> RunCatalog:
+    return RunCatalog(runs_root(base_dir))
+
+
+def refresh_catalog(run_root: Path, status: str | None = None) -> None:
+    RunCatalog(run_root.parent).record(
+        run_root,
+        load_slides(run_root).get("slides", []),
+        load_index(run_root),
+        topic=load_spec(run_root).get("topic"),
+        status=status,
+    )
+
+
+def rebuild_catalog(base_dir: Path) -> None:
+    root = runs_root(base_dir)
+    if not root.exists():
+        return
+    runs = catalog(base_dir)
+    present = set()
+    for path in sorted(root.iterdir()):
+        if path.is_dir():
+            present.add(path.name)
+            refresh_catalog(path)
+    for summary in list(runs.runs()):
+        if summary.run_id not in present:
+            runs.forget(summary.run_id)
+
+
 def latest_run_id(base_dir: Path) -> str:
     root = runs_root(base_dir)
     if not root.exists():
         raise SystemExit("No runs directory found")
-    candidates = [path for path in root.iterdir() if path.is_dir()]
-    if not candidates:
+    runs = catalog(base_dir)
+    if not runs.exists():
+        # One scan to seed the catalog for trees created before it existed.
+        rebuild_catalog(base_dir)
+    latest = runs.latest()
+    if latest is None or not run_dir(base_dir, latest).exists():
         raise SystemExit("No runs available")
-    latest = max(candidates, key=lambda path: path.stat().st_mtime)
-    return latest.name
+    return latest
+
+
+def pending_run_ids(base_dir: Path) -> list[str]:
+    root = runs_root(base_dir)
+    if not root.exists():
+        return []
+    runs = catalog(base_dir)
+    if not runs.exists():
+        rebuild_catalog(base_dir)
+    pending = runs.runs(statuses=["draft", "incomplete", "generating", "failed"])
+    # "generating" is only pending once its owner is gone (a crash or a kill -9).
+    return sorted(
+        summary.run_id
+        for summary in pending
+        if summary.slides and lock_owner(run_dir(base_dir, summary.run_id)) is None
+    )
+
+
+def lock_owner(run_root: Path) -> int | None:
+    path = run_root / LOCK_NAME
+    try:
+        record = load_json(path, None)
+    except (OSError, json.JSONDecodeError):
+        # Torn by a crash between creating the lock and writing it.
+        record = {}
+    if record is None:
+        return None
+    pid = int(record.get("pid", 0))
+    if pid <= 0:
+        return None
+    if record.get("host") != socket.gethostname():
+        # Another machine sharing the directory; its process cannot be probed from here.
+        return pid
+    if pid == os.getpid():
+        return pid if path.resolve() in _held_locks else None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return pid
+
+
+@contextmanager
+def run_lock(run_root: Path) -> Iterator[None]:
+    path = run_root / LOCK_NAME
+    record = json.dumps({"pid": os.getpid(), "host": socket.gethostname(), "started_at": time.time()})
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            owner = lock_owner(run_root)
+            if owner is not None:
+                raise RuntimeError(f"Run {run_root.name} is already being generated by process {owner}.")
+            # The owner died without releasing the lock.
+            path.unlink(missing_ok=True)
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        handle.write(record)
+    _held_locks.add(path.resolve())
+    try:
+        yield
+    finally:
+        _held_locks.discard(path.resolve())
+        path.unlink(missing_ok=True)
+
+
+def all_run_ids(base_dir: Path) -> list[str]:
+    root = runs_root(base_dir)
+    if not root.exists():
+        return []
+    runs = catalog(base_dir)
+    if not runs.exists():
+        rebuild_catalog(base_dir)
+    # Runs deleted by hand stay in the catalog until the next `list --rebuild`.
+    return sorted(summary.run_id for summary in runs.runs() if run_dir(base_dir, summary.run_id).is_dir())
 
 
 def ensure_run_dirs(base_dir: Path, run_id: str) -> dict[str, Path]:
@@ -47,7 +166,11 @@ def save_spec(run_root: Path, spec: dict[str, Any]) -> None:
 
 
 def load_slides(run_root: Path) -> dict[str, Any]:
-    return load_json(run_root / "slides.json", {"slides": []})
+    slides = load_json(run_root / "slides.json", {"slides": []})
+    for event in read_journal(run_root, slides.get("journal_seq", 0)):
+        apply_slides_event(slides, event)
+        slides["journal_seq"] = event["seq"]
+    return slides
 
 
 def save_slides(run_root: Path, slides: dict[str, Any]) -> None:
@@ -55,7 +178,11 @@ def save_slides(run_root: Path, slides: dict[str, Any]) -> None:
 
 
 def load_index(run_root: Path) -> dict[str, Any]:
-    return load_json(run_root / "index.json", {"slides": {}})
+    index = load_json(run_root / "index.json", {"slides": {}})
+    for event in read_journal(run_root, index.get("journal_seq", 0)):
+        apply_index_event(index, event)
+        index["journal_seq"] = event["seq"]
+    return index
 
 
 def save_index(run_root: Path, index: dict[str, Any]) -> None:
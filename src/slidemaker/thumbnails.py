@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image
+
+from .cache import content_hash
+from .imaging import flatten_alpha
+from .utils import ensure_dir, load_json, save_json
+
+
+THUMB_DIR_NAME = "thumbs"
+MANIFEST_NAME = "manifest.json"
+THUMB_WIDTHS = (320, 640)
+
+
+@dataclass
+class Thumbnail:
+    files: dict[int, str]
+    width: int
+    height: int
+
+    @property
+    def src(self) -> str:
+        return self.files[min(self.files)]
+
+    @property
+    def srcset(self) -> str:
+        return ", ".join(f"{name} {width}w" for width, name in sorted(self.files.items()))
+
+
+def _render(source: Path, out_dir: Path, digest: str, widths: tuple[int, ...]) -> dict:
+    with Image.open(source) as image:
+        image = flatten_alpha(image)
+        image.load()
+    files: dict[str, str] = {}
+    for width in widths:
+        name = f"{digest[:16]}_{width}.jpg"
+        path = out_dir / name
+        if not path.exists():
+            height = max(round(image.height * min(width, image.width) / image.width), 1)
+            resized = image.resize((min(width, image.width), height), Image.LANCZOS)
+            tmp_path = path.with_name(f".{name}.tmp")
+            resized.save(tmp_path, format="JPEG", quality=80, optimize=True, progressive=True)
+            os.replace(tmp_path, path)
+        files[str(width)] = name
+    return {"hash": digest, "files": files, "width": image.width, "height": image.height}
+
+
+def ensure_thumbnails(
+    run_root: Path,
+    image_paths: list[Path],
+    *,
+    widths: tuple[int, ...] = THUMB_WIDTHS,
+    workers: int | None = None,
+) -> dict[Path, Thumbnail]:
+    thumb_dir = run_root / THUMB_DIR_NAME
+    ensure_dir(thumb_dir)
+    manifest_path = thumb_dir / MANIFEST_NAME
+    manifest = load_json(manifest_path, {})
+
+    # Sources whose size and mtime match the manifest are not even re-read; a changed stat
+    # only costs a re-render when the content hash changed too.
+    stale: list[tuple[Path, str, os.stat_result, str]] = []
+    for path in image_paths:
+        key = str(path.relative_to(run_root))
+        stat = path.stat()
+        entry = manifest.get(key)
+        if (
+            entry
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+            and entry.get("size") == stat.st_size
+            and sorted(entry.get("files", {})) == sorted(str(width) for width in widths)
+            and all((thumb_dir / name).exists() for name in entry["files"].values())
+        ):
+            continue
+        stale.append((path, key, stat, content_hash(path.read_bytes())))
+
+    if stale:
+        workers = workers or os.cpu_count() or 1
+        jobs = [(path, thumb_dir, digest, widths) for path, _, _, digest in stale]
+        if workers <= 1 or len(jobs) <= 1:
+            rendered = [_render(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                rendered = list(pool.map(_render, *zip(*jobs)))
+        for (_, key, stat, _), entry in zip(stale, rendered):
+            manifest[key] = {**entry, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        save_json(manifest_path, manifest)
+
+    thumbnails: dict[Path, Thumbnail] = {}
+    for path in image_paths:
+        entry = manifest[str(path.relative_to(run_root))]
+        thumbnails[path] = Thumbnail(
+            files={int(width): f"{THUMB_DIR_NAME}/{name}" for width, name in entry["files"].items()},
+            width=entry["width"],
+            height=entry["height"],
+        )
+    return thumbnails
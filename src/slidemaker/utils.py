@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import json
 import os
+import random
 import re
 import asyncio
+import shutil
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Callable, Iterable
@@ -39,7 +41,41 @@ def load_json(path: Path, default: Any) -> Any:
 
 
 def save_json(path: Path, data: Any) -> None:
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=True), encoding="utf-8")
+    # Write to a sibling temp file and swap it in so readers never see a partial file.
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(data, indent=2, ensure_ascii=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+# Linux FICLONE ioctl: share extents copy-on-write on btrfs/XFS.
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with src.open("rb") as source, dst.open("wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    # Image files are never modified once written, so a hardlink (or reflink across
+    # devices that support it) stands in for a byte copy.
+    tmp_path = dst.with_name(f".{dst.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        if not _reflink(src, tmp_path):
+            shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
 
 
 @dataclass
@@ -47,17 +83,20 @@ class BackoffConfig:
     base_delay: float = 1.0
     max_delay: float = 30.0
     max_retries: int = 6
+    jitter: float = 1.0
 
 
-def next_delay(attempt: int, base_delay: float, max_delay: float) -> float:
-    delay = base_delay * (2 ** attempt)
-    return min(delay, max_delay)
+def next_delay(attempt: int, base_delay: float, max_delay: float, jitter: float = 0.0) -> float:
+    delay = min(base_delay * (2 ** attempt), max_delay)
+    return delay * (1.0 - jitter * random.random())
 
 
 async def retry_async(
     func: Callable[[], Any],
     is_retryable: Callable[[Exception], bool],
     config: BackoffConfig,
+    retry_after: Callable[[Exception], float | None] | None = None,
+    on_retry: Callable[[Exception, float], None] | None = None,
 ) -> Any:
     last_err: Exception | None = None
     for attempt in range(config.max_retries + 1):
@@ -67,7 +106,13 @@ async def retry_async(
             last_err = exc
             if attempt >= config.max_retries or not is_retryable(exc):
                 raise
-            delay = next_delay(attempt, config.base_delay, config.max_delay)
+            hinted = retry_after(exc) if retry_after else None
+            if hinted is not None:
+                delay = hinted + random.uniform(0, config.base_delay * config.jitter)
+            else:
+                delay = next_delay(attempt, config.base_delay, config.max_delay, config.jitter)
+            if on_retry is not None:
+                on_retry(exc, delay)
             await asyncio.sleep(delay)
     if last_err:
         raise last_err
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from slidemaker.fake import FakeGrader, FakeOptions
+from slidemaker.pipeline import RunConfig, generate_runs
+from slidemaker.store import LOCK_NAME, ensure_run_dirs, load_index, load_slides, save_slides, save_spec
+
+
+SLIDES = 5
+# Attempts per slide for seed 7; a change here means the retry loop or the seeded draws moved.
+EXPECTED_ATTEMPTS = {"00_slide": 2, "01_slide": 3, "02_slide": 1, "03_slide": 1, "04_slide": 1}
+
+
+def make_run(base_dir: Path) -> Path:
+    run_root = ensure_run_dirs(base_dir, "seeded")["root"]
+    save_spec(run_root, {"topic": "seeded", "image_size": "64x64"})
+    save_slides(
+        run_root,
+        {
+            "slides": [
+                {
+                    "id": f"{index:02d}_slide",
+                    "order": index,
+                    "title": f"Slide {index}",
+                    "prompt": f"Slide {index}",
+                    "rubric": ["Title is legible", "Layout is balanced"],
+                }
+                for index in range(SLIDES)
+            ]
+        },
+    )
+    return run_root
+
+
+def make_config(run_root: Path) -> RunConfig:
+    # One worker per stage and no latency jitter keep the seeded draws in a fixed order.
+    return RunConfig(
+        run_root=run_root,
+        image_model="fake-image",
+        grader_model="fake-grader",
+        image_quality="low",
+        image_background="opaque",
+        max_attempts=0,
+        concurrency=1,
+        max_concurrency=1,
+        order="outline",
+        backend="fake",
+        fake=FakeOptions(
+            image_latency=0.0,
+            grade_latency=0.0,
+            latency_jitter=0.0,
+            pass_probability=0.5,
+            seed=7,
+        ),
+    )
+
+
+def outcome(run_root: Path) -> tuple[int, dict[str, list[bool]]]:
+    slides = load_slides(run_root)["slides"]
+    approved = sum(1 for slide in slides if slide.get("status") == "approved")
+    index = load_index(run_root)["slides"]
+    return approved, {slide_id: [attempt["pass"] for attempt in entry["attempts"]] for slide_id, entry in index.items()}
+
+
+def attempt_files(run_root: Path) -> dict[str, list[str]]:
+    return {
+        path.name: sorted(item.name for item in path.glob("attempt_*.png"))
+        for path in sorted((run_root / "attempts").iterdir())
+    }
+
+
+def test_seeded_fake_run_is_reproducible(tmp_path: Path) -> None:
+    first = make_run(tmp_path / "first")
+    second = make_run(tmp_path / "second")
+    asyncio.run(generate_runs([make_config(first)]))
+    asyncio.run(generate_runs([make_config(second)]))
+
+    approved, attempts = outcome(first)
+    assert approved == SLIDES
+    assert {slide_id: len(passes) for slide_id, passes in attempts.items()} == EXPECTED_ATTEMPTS
+    assert all(passes[-1] and not any(passes[:-1]) for passes in attempts.values())
+    assert outcome(second) == (approved, attempts)
+    assert attempt_files(first) == {
+        slide_id: [f"attempt_{number:03d}.png" for number in range(1, count + 1)]
+        for slide_id, count in EXPECTED_ATTEMPTS.items()
+    }
+    assert not (first / LOCK_NAME).exists()
+
+
+def test_interrupted_run_resumes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    run_root = make_run(tmp_path)
+    grade_image = FakeGrader.grade_image
+    graded = 0
+
+    async def interrupt_after_three(self: FakeGrader, **kwargs):
+        nonlocal graded
+        graded += 1
+        if graded > 3:
+            raise KeyboardInterrupt
+        return await grade_image(self, **kwargs)
+
+    monkeypatch.setattr(FakeGrader, "grade_image", interrupt_after_three)
+    with pytest.raises(KeyboardInterrupt):
+        asyncio.run(generate_runs([make_config(run_root)]))
+    monkeypatch.setattr(FakeGrader, "grade_image", grade_image)
+
+    interrupted_approved, interrupted = outcome(run_root)
+    assert interrupted_approved < SLIDES
+    assert sum(len(passes) for passes in interrupted.values()) == 3
+
+    asyncio.run(generate_runs([make_config(run_root)]))
+    approved, attempts = outcome(run_root)
+    assert approved == SLIDES
+    # Graded attempts survive the restart and numbering carries on after them.
+    for slide_id, passes in interrupted.items():
+        assert attempts[slide_id][: len(passes)] == passes
+        if passes and passes[-1]:
+            assert attempts[slide_id] == passes
+    assert all(passes[-1] and not any(passes[:-1]) for passes in attempts.values())
+    assert attempt_files(run_root) == {
+        slide_id: [f"attempt_{number:03d}.png" for number in range(1, len(passes) + 1)]
+        for slide_id, passes in attempts.items()
+    }
+    assert not (run_root / LOCK_NAME).exists()
+
+    # A finished run resumes to itself: nothing is regenerated.
+    asyncio.run(generate_runs([make_config(run_root)]))
+    assert outcome(run_root) == (approved, attempts)
+